@@ -0,0 +1,54 @@
+import queue
+import threading
+import time
+
+
+class BatchWriter:
+    """
+    Thread writer untuk penyimpanan SQLite: item dikirim ke antrian lalu diterapkan
+    per batch oleh `apply(items)` (mis. satu transaksi per batch), jadi request tidak
+    menunggu disk. Batch dikumpulkan paling lama `batch_interval` detik atau sampai
+    `max_batch` item. Galat di `apply` dicatat, thread writer tetap berjalan.
+    """
+
+    def __init__(self, apply, name: str, batch_interval: float = 0.05, max_batch: int = 256):
+        self.apply = apply
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        self._queue.put(item)
+
+    def flush(self, timeout: float = 5.0):
+        """Tunggu sampai semua item yang sudah diantrikan selesai diterapkan."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            items = [item for item in batch if not isinstance(item, threading.Event)]
+            try:
+                if items:
+                    self.apply(items)
+            except Exception as e:
+                print(f"❌ {self._thread.name}: gagal menerapkan {len(items)} perubahan: {e}")
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
@@ -0,0 +1,136 @@
+"""
+Benchmark micro-batching retrieval: throughput (request/detik) dan latensi (p50/p99)
+jalur tanpa batch (satu embed + satu query per request) dibandingkan jalur
+MicroBatcher (embed & query dari request bersamaan digabung), di bawah beban
+sintetis dari banyak thread.
+
+API embedding disimulasikan: setiap panggilan butuh `--embed-latency-ms` ditambah
+`--embed-item-ms` per teks, dan paling banyak `--api-concurrency` panggilan berjalan
+bersamaan (mewakili kuota/koneksi ke Gemini). Vector store memakai vektor sintetis,
+jadi tidak butuh API key.
+
+Routing dokumen disimulasikan seperti di produksi: chunk dibagi ke `--documents`
+file, dan setiap request hanya mencari di `--route-top-n` file acak (0 = tanpa
+routing), jadi request bersamaan hampir selalu punya filter berbeda.
+
+Jalankan:
+    python benchmark_micro_batch.py --chunks 5000 --concurrency 1,8,32 --requests 256
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmark_retriever import DIM, build, percentile_ms
+from micro_batcher import MicroBatcher
+
+
+class SimulatedEmbeddingAPI:
+    def __init__(self, latency: float, per_item: float, concurrency: int):
+        self.latency = latency
+        self.per_item = per_item
+        self._slots = threading.Semaphore(concurrency)
+        self._rng = np.random.default_rng(7)
+        self.calls = 0
+
+    def embed(self, texts: list) -> list:
+        with self._slots:
+            self.calls += 1
+            time.sleep(self.latency + self.per_item * len(texts))
+        vectors = self._rng.standard_normal((len(texts), DIM)).astype(np.float32)
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tolist()
+
+
+def routed_files(i: int, documents: int, top_n: int):
+    """File hasil routing sintetis untuk request ke-i (None = cari di seluruh korpus)."""
+    if top_n <= 0 or documents <= top_n:
+        return None
+    rng = np.random.default_rng(i)
+    return frozenset(f"dokumen-{d}.txt" for d in rng.choice(documents, size=top_n, replace=False))
+
+
+def run_level(handle, concurrency: int, total: int, documents: int, top_n: int) -> dict:
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        handle(f"pertanyaan sintetis nomor {i}", routed_files(i, documents, top_n))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "throughput": total / elapsed,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p99_ms": percentile_ms(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=256, help="jumlah request per tingkat konkurensi")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--backend", default="numpy")
+    parser.add_argument("--documents", type=int, default=50, help="jumlah file sumber sintetis")
+    parser.add_argument("--route-top-n", type=int, default=3, help="file yang dicari per request (0 = tanpa routing)")
+    parser.add_argument("--embed-latency-ms", type=float, default=80.0)
+    parser.add_argument("--embed-item-ms", type=float, default=0.5)
+    parser.add_argument("--api-concurrency", type=int, default=4)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((args.chunks, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    print(f"📊 {args.backend}, {args.chunks} chunk, {args.requests} request per tingkat, top-{args.top_k}, "
+          f"API embed {args.embed_latency_ms:.0f} ms x {args.api_concurrency} koneksi, "
+          f"routing {args.route_top_n or 'nonaktif'} dari {args.documents} dokumen")
+    with tempfile.TemporaryDirectory() as tmp:
+        store, _ = build(args.backend, os.path.join(tmp, args.backend), vectors, documents=args.documents)
+        api = SimulatedEmbeddingAPI(args.embed_latency_ms / 1000, args.embed_item_ms / 1000, args.api_concurrency)
+
+        def unbatched(text, source_files):
+            embedding = api.embed([text])[0]
+            return store.query(embedding, n_results=args.top_k, source_files=source_files)
+
+        options = {"max_batch_size": args.max_batch_size, "max_wait": args.max_wait_ms / 1000, "workers": args.workers}
+        embed_batcher = MicroBatcher(lambda _, texts: api.embed(texts), name="bench-embed", **options)
+        query_batcher = MicroBatcher(
+            lambda _, items: store.query_batch(
+                [embedding for embedding, _ in items], n_results=args.top_k,
+                filters=[(frozenset(), source_files) for _, source_files in items],
+            ),
+            name="bench-query", **options
+        )
+
+        def batched(text, source_files):
+            return query_batcher.submit((embed_batcher.submit(text), source_files))
+
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            level = (concurrency, args.requests, args.documents, args.route_top_n)
+            base = run_level(unbatched, *level)
+            calls_before, batches_before = api.calls, query_batcher.stats()["batches"]
+            micro = run_level(batched, *level)
+            embed_calls = api.calls - calls_before
+            query_batches = query_batcher.stats()["batches"] - batches_before
+            print(f"- konkurensi {concurrency:>3}: tanpa batch {base['throughput']:7.1f} req/s "
+                  f"(p50 {base['p50_ms']:6.1f} ms, p99 {base['p99_ms']:6.1f} ms) | "
+                  f"micro-batch {micro['throughput']:7.1f} req/s "
+                  f"(p50 {micro['p50_ms']:6.1f} ms, p99 {micro['p99_ms']:6.1f} ms, "
+                  f"{args.requests / embed_calls:.1f} teks/embed, {args.requests / query_batches:.1f} query/batch) | "
+                  f"speedup {micro['throughput'] / base['throughput']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
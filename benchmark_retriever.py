@@ -0,0 +1,93 @@
+"""
+Benchmark backend vector store: latensi query (p50/p99) dan waktu cold start.
+
+Memakai vektor sintetis (dimensi sama dengan text-embedding-004), jadi tidak
+butuh API key. Cold start diukur di proses Python baru: import library +
+membuka index + query pertama.
+
+Jalankan:
+    python benchmark_retriever.py --chunks 500 --queries 2000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from vector_store import create_vector_store
+
+DIM = 768
+
+COLD_START_SNIPPET = """
+import os, sys, time
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+start = time.perf_counter()
+sys.path.insert(0, {repo!r})
+from vector_store import create_vector_store
+store = create_vector_store({backend!r}, **{kwargs!r})
+store.query([0.01] * {dim}, n_results=3)
+print(time.perf_counter() - start)
+"""
+
+
+def build(backend: str, path: str, vectors: np.ndarray, documents: int = 1) -> tuple:
+    kwargs = {"path": path, "collection_name": "benchmark"} if backend == "chroma" else {"path": path}
+    store = create_vector_store(backend, **kwargs)
+    ids = [f"chunk-{i}" for i in range(len(vectors))]
+    for start in range(0, len(ids), 500):
+        end = start + 500
+        store.upsert(
+            ids[start:end], vectors[start:end].tolist(),
+            [f"dokumen {i}" for i in range(start, min(end, len(ids)))],
+            [
+                {"source_file": f"dokumen-{i % documents}.txt" if documents > 1 else "benchmark.txt", "chunk_id": ids[i]}
+                for i in range(start, min(end, len(ids)))
+            ],
+        )
+    store.persist()
+    return store, kwargs
+
+
+def percentile_ms(samples: list, pct: float) -> float:
+    return float(np.percentile(samples, pct) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--backends", default="chroma,numpy")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((args.chunks, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = rng.standard_normal((args.queries, DIM)).astype(np.float32).tolist()
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    print(f"📊 {args.chunks} chunk, {args.queries} query, top-{args.top_k}")
+    for backend in args.backends.split(","):
+        with tempfile.TemporaryDirectory() as tmp:
+            store, kwargs = build(backend, os.path.join(tmp, backend), vectors)
+
+            latencies = []
+            for q in queries:
+                start = time.perf_counter()
+                store.query(q, n_results=args.top_k)
+                latencies.append(time.perf_counter() - start)
+
+            snippet = COLD_START_SNIPPET.format(repo=repo, backend=backend, kwargs=kwargs, dim=DIM)
+            cold = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, check=True)
+            cold_start = float(cold.stdout.strip().splitlines()[-1])
+            del store
+
+        print(f"- {backend:<7} p50 {percentile_ms(latencies, 50):7.3f} ms | "
+              f"p99 {percentile_ms(latencies, 99):7.3f} ms | cold start {cold_start * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import json
+import math
+import os
+import re
+import threading
+
+from chunker import chunk_source
+
+# Kata umum Bahasa Indonesia yang tidak membantu pencarian leksikal
+STOPWORDS = {
+    "yang", "dan", "di", "ke", "dari", "untuk", "dengan", "pada", "dalam", "atau", "ini", "itu",
+    "adalah", "oleh", "sebagai", "akan", "juga", "tidak", "ada", "dapat", "bisa", "telah", "sudah",
+    "apa", "apakah", "bagaimana", "mengapa", "kenapa", "siapa", "kapan", "dimana", "mana", "berapa",
+    "saya", "kami", "kita", "anda", "kamu", "nya", "pun", "lah", "kah", "ya", "dong", "sih", "tentang",
+    "serta", "bagi", "secara", "karena", "jika", "maka", "agar", "sehingga", "para", "tersebut",
+}
+
+# Singkatan yang sering dipakai pengguna -> bentuk yang dipakai di dokumen regulasi
+ABBREVIATIONS = {
+    "no": "nomor", "nmr": "nomor", "thn": "tahun", "th": "tahun", "psl": "pasal",
+    "kemsos": "kemensos", "perpres": "peraturan presiden",
+}
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+_CLITICS = ("nya", "lah", "kah")
+
+
+def tokenize(text: str) -> list:
+    """
+    Tokenisasi sederhana yang sadar Bahasa Indonesia: huruf kecil, angka dipertahankan
+    (penting untuk "pasal 5", "nomor 3 tahun 2025"), singkatan dinormalkan, klitik
+    -nya/-lah/-kah dilepas, dan stopword dibuang.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        token = ABBREVIATIONS.get(token, token)
+        for part in token.split():
+            if len(part) > 5 and part.endswith(_CLITICS):
+                part = part[:-3]
+            if part not in STOPWORDS:
+                tokens.append(part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Inverted index BM25 yang bisa ditambah/dihapus per chunk dan disimpan ke disk,
+    sehingga startup cukup memuat file JSON tanpa menokenisasi ulang korpus.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.postings = {}   # term -> {chunk_id: tf}
+        self.doc_len = {}    # chunk_id -> jumlah token
+        self.total_len = 0
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        self.postings = data["postings"]
+        self.doc_len = data["doc_len"]
+        self.total_len = sum(self.doc_len.values())
+        self.loaded = True
+
+    def persist(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"postings": self.postings, "doc_len": self.doc_len}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.loaded = True
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def add(self, chunk_id: str, text: str):
+        tokens = tokenize(text)
+        with self._lock:
+            if chunk_id in self.doc_len:
+                self.remove(chunk_id)
+            for token in tokens:
+                docs = self.postings.setdefault(token, {})
+                docs[chunk_id] = docs.get(chunk_id, 0) + 1
+            self.doc_len[chunk_id] = len(tokens)
+            self.total_len += len(tokens)
+
+    def remove(self, chunk_id: str):
+        with self._lock:
+            if chunk_id not in self.doc_len:
+                return
+            self.total_len -= self.doc_len.pop(chunk_id)
+            # Index kecil: memindai daftar term lebih murah daripada menyimpan term per dokumen
+            for term in [t for t, docs in self.postings.items() if chunk_id in docs]:
+                del self.postings[term][chunk_id]
+                if not self.postings[term]:
+                    del self.postings[term]
+
+    def search(self, query: str, n_results: int = 10, exclude_ids=frozenset(), source_files=None) -> list:
+        """
+        Mengembalikan [(chunk_id, skor)] terurut dari skor BM25 tertinggi.
+        Jika `source_files` diberikan, hanya chunk dari file tersebut yang dinilai.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self.doc_len)
+            if not n_docs or not terms:
+                return []
+            avg_len = self.total_len / n_docs
+            scores = {}
+            for term in terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for chunk_id, tf in docs.items():
+                    if chunk_id in exclude_ids:
+                        continue
+                    if source_files is not None and chunk_source(chunk_id) not in source_files:
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[chunk_id] / avg_len)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
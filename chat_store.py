@@ -0,0 +1,151 @@
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from batch_writer import BatchWriter
+
+DEFAULT_SESSION_ID = "default"
+
+
+class ChatStore:
+    """
+    Penyimpanan riwayat percakapan & cache jawaban di SQLite (mode WAL).
+
+    - Append riwayat dan upsert cache adalah satu baris INSERT (O(1)), bukan
+      menulis ulang seluruh file JSON.
+    - Penulisan dikirim ke antrian dan dijalankan thread writer dalam satu
+      transaksi per batch, jadi request tidak menunggu disk dan fsync ter-batch
+      (WAL + synchronous=NORMAL: fsync hanya saat checkpoint).
+    - Transaksi SQLite atomik: crash di tengah penulisan tidak merusak file.
+    - Startup hanya membaca N riwayat terakhir, tidak bergantung total entri.
+    """
+
+    def __init__(self, path: str = "chatbot_store.sqlite3", batch_interval: float = 0.05, max_batch: int = 256):
+        self.path = path
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL DEFAULT 'default',
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS qa_cache (
+                question TEXT PRIMARY KEY,
+                answer TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                sources TEXT
+            );
+            """
+        )
+        # Database dari versi sebelum ada sesi: tambahkan kolom session_id
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(history)")}
+        if "session_id" not in columns:
+            self._conn.execute("ALTER TABLE history ADD COLUMN session_id TEXT NOT NULL DEFAULT 'default'")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_session ON history(session_id, id)")
+        self._conn.commit()
+        self._lock = threading.Lock()  # satu koneksi dipakai bergantian oleh writer & pembaca
+        self._writer = BatchWriter(self._apply, name="chat-store-writer",
+                                   batch_interval=batch_interval, max_batch=max_batch)
+
+    # --- Thread writer ---
+    def _apply(self, statements: list):
+        try:
+            with self._lock:
+                with self._conn:  # satu transaksi untuk seluruh batch
+                    for sql, params in statements:
+                        self._conn.execute(sql, params)
+        except sqlite3.Error as e:
+            print(f"❌ Gagal menulis {len(statements)} perubahan ke {self.path}: {e}")
+
+    def _submit(self, sql: str, params: tuple):
+        self._writer.submit((sql, params))
+
+    def flush(self, timeout: float = 5.0):
+        """Tunggu sampai semua penulisan yang sudah diantrikan masuk ke disk."""
+        self._writer.flush(timeout)
+
+    # --- Riwayat ---
+    def append_history(self, question: str, answer: str, session_id: str = DEFAULT_SESSION_ID):
+        self._submit(
+            "INSERT INTO history (session_id, question, answer, created_at) VALUES (?, ?, ?, ?)",
+            (session_id, question, answer, time.time()),
+        )
+
+    def recent_history(self, limit: int, session_id: str = DEFAULT_SESSION_ID) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question, answer FROM history WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, limit),
+            ).fetchall()
+        return [(q, a) for q, a in reversed(rows)]
+
+    # --- Cache jawaban ---
+    def cache_put(self, question: str, answer: str, embedding, created_at: float, sources):
+        blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+        self._submit(
+            "INSERT OR REPLACE INTO qa_cache (question, answer, embedding, created_at, sources) VALUES (?, ?, ?, ?, ?)",
+            (question, answer, blob, created_at, json.dumps(sources) if sources is not None else None),
+        )
+
+    def cache_delete(self, question: str):
+        self._submit("DELETE FROM qa_cache WHERE question = ?", (question,))
+
+    def cache_entries(self) -> list:
+        """Semua entri cache: [(pertanyaan, jawaban, embedding|None, created_at, sources|None)]."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question, answer, embedding, created_at, sources FROM qa_cache"
+            ).fetchall()
+        return [
+            (q, a, np.frombuffer(blob, dtype=np.float32) if blob is not None else None, created_at,
+             json.loads(sources) if sources is not None else None)
+            for q, a, blob, created_at, sources in rows
+        ]
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            history = self._conn.execute("SELECT 1 FROM history LIMIT 1").fetchone()
+            cache = self._conn.execute("SELECT 1 FROM qa_cache LIMIT 1").fetchone()
+        return history is None and cache is None
+
+    # --- Migrasi dari file JSON lama ---
+    def import_legacy_json(self, history_path: str, cache_path: str):
+        """Impor sekali history.json & cache.json lama jika database masih kosong."""
+        if not self.is_empty():
+            return
+        imported = 0
+        try:
+            with open(history_path, 'r', encoding='utf-8') as f:
+                for question, answer in json.load(f):
+                    self.append_history(question, answer)
+                    imported += 1
+        except (FileNotFoundError, json.JSONDecodeError, ValueError):
+            pass
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            now = time.time()
+            for question, value in cache.items():
+                if isinstance(value, str):
+                    value = {"answer": value}
+                self.cache_put(
+                    question, value["answer"], value.get("embedding"),
+                    value.get("created_at", now), value.get("sources")
+                )
+                imported += 1
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            pass
+        self.flush()
+        if imported:
+            print(f"📥 {imported} entri riwayat/cache diimpor dari file JSON lama ke {self.path}.")
@@ -1,10 +1,16 @@
 # ai-backend/chatbot.py
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 import main  # ini file Python kamu yang ada init_chatbot & get_response
 import dtsen_scraper
 import asyncio
+import functools
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 app = FastAPI()
 
@@ -17,22 +23,103 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Init chatbot sekali di awal
-chatbot = main.init_chatbot()
+# Init chatbot sekali di awal. Sinkronisasi index jalan di background (lihat startup),
+# jadi worker langsung bisa menerima request dari snapshot index terakhir.
+chatbot = main.init_chatbot(sync_index=False)
+
+# get_response memblokir (embedding, vector store, Gemini), jadi dijalankan di pool
+# thread khusus yang terbatas; event loop tetap bebas melayani request lain.
+chat_executor = ThreadPoolExecutor(max_workers=main.CHAT_MAX_WORKERS, thread_name_prefix="chat")
+chat_slots = asyncio.Semaphore(main.CHAT_MAX_PENDING)
+
+@app.on_event("startup")
+async def start_index_sync():
+    if chatbot:
+        chatbot.start_background_sync(main.SOURCE_FOLDER_PATH)
 
 class ChatRequest(BaseModel):
     message: str
+    # Kosongkan untuk memulai sesi baru; kirim ulang session_id dari respons untuk melanjutkan
+    session_id: Optional[str] = None
 
 @app.post("/chat")
 async def chat_endpoint(req: ChatRequest):
     question = req.message
-    answer = chatbot.get_response(question)
-    return {"answer": answer}
+    session_id = req.session_id or uuid.uuid4().hex
+    if chat_slots.locked():
+        return JSONResponse(status_code=503, content={"detail": "Server sedang sibuk, silakan coba lagi."})
+    async with chat_slots:
+        loop = asyncio.get_running_loop()
+        answer = await loop.run_in_executor(
+            chat_executor, functools.partial(chatbot.get_response, question, session_id=session_id)
+        )
+    return {"answer": answer, "session_id": session_id}
+
+def _sse(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest):
+    """
+    Server-sent events: `event: meta` (session_id), lalu satu event `data` per potongan
+    jawaban ({"delta": ...}) begitu diterima dari Gemini, dan `event: done` di akhir.
+    """
+    question = req.message
+    session_id = req.session_id or uuid.uuid4().hex
+    if chat_slots.locked():
+        return JSONResponse(status_code=503, content={"detail": "Server sedang sibuk, silakan coba lagi."})
+
+    async def events():
+        async with chat_slots:
+            loop = asyncio.get_running_loop()
+            pieces = chatbot.stream_response(question, session_id=session_id)
+            yield _sse({"session_id": session_id}, event="meta")
+            try:
+                while True:
+                    # Tiap potongan diambil di executor chat karena generator-nya memblokir
+                    piece = await loop.run_in_executor(chat_executor, next, pieces, None)
+                    if piece is None:
+                        break
+                    yield _sse({"delta": piece})
+            finally:
+                # Klien putus di tengah jalan: tutup generator supaya jawaban parsial tidak disimpan
+                await loop.run_in_executor(chat_executor, pieces.close)
+        yield _sse({"session_id": session_id}, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.get("/")
 async def root():
     return {"message": "Chatbot jalan nih, pakai POST /chat buat ngobrol"}
 
+@app.on_event("shutdown")
+async def flush_chat_store():
+    chat_executor.shutdown(wait=True)
+    if chatbot:
+        chatbot.chat_store.flush()
+        chatbot.query_embeddings.flush()
+
+@app.get("/health/live")
+async def liveness():
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness():
+    if not chatbot:
+        return JSONResponse(status_code=503, content={"ready": False, "index_sync": None})
+    ready = chatbot.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "index_sync": chatbot.sync_status}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    if not chatbot:
+        return JSONResponse(status_code=503, content={})
+    return chatbot.get_metrics()
+
 @app.post("/scraper")
 async def scraper_endpoint():
     loop = asyncio.get_event_loop()
@@ -0,0 +1,114 @@
+import hashlib
+
+# Ukuran chunk (karakter). Batas atas sama dengan chunk lama (2048).
+CHUNK_MIN_SIZE = 1024
+CHUNK_MAX_SIZE = 2048
+
+# Semakin banyak bit, semakin jarang sebuah anchor dipakai sebagai batas.
+PARAGRAPH_MASK_BITS = 1
+SENTENCE_MASK_BITS = 3
+
+SENTENCE_ENDS = ".!?;"
+
+# Tabel "gear" 256 angka 64-bit yang deterministik (tidak boleh berubah antar versi,
+# karena batas chunk bergantung padanya).
+_GEAR = [int.from_bytes(hashlib.sha256(f"gear-{i}".encode()).digest()[:8], "big") for i in range(256)]
+_MASK64 = (1 << 64) - 1
+
+
+def _rolling_hashes(text: str) -> list:
+    """
+    Gear hash bergulir per posisi karakter. Bit-bit atas hash di posisi i hanya
+    ditentukan oleh ±64 karakter terakhir, sehingga keputusan batas chunk
+    ditentukan oleh isi teks di sekitarnya, bukan oleh offset absolut.
+    """
+    hashes = [0] * len(text)
+    h = 0
+    for i, ch in enumerate(text):
+        h = ((h << 1) + _GEAR[ord(ch) & 0xFF]) & _MASK64
+        hashes[i] = h
+    return hashes
+
+
+def _anchor_kind(text: str, i: int):
+    """Mengembalikan 'paragraph' / 'sentence' jika batas boleh diletakkan tepat setelah posisi i."""
+    ch = text[i]
+    if ch == "\n":
+        return "paragraph"
+    if ch in SENTENCE_ENDS and (i + 1 == len(text) or text[i + 1].isspace()):
+        return "sentence"
+    return None
+
+
+def _is_cut(kind: str, h: int) -> bool:
+    bits = PARAGRAPH_MASK_BITS if kind == "paragraph" else SENTENCE_MASK_BITS
+    return (h >> (64 - bits)) == 0
+
+
+def chunk_text(text: str, min_size: int = CHUNK_MIN_SIZE, max_size: int = CHUNK_MAX_SIZE) -> list:
+    """
+    Content-defined chunking: batas chunk hanya diletakkan di akhir paragraf atau
+    kalimat yang lolos uji rolling hash, dengan jendela ukuran [min_size, max_size].
+    Karena keputusan batas bergantung pada isi lokal, menyisipkan satu kalimat di
+    awal dokumen hanya mengubah chunk di sekitar suntingan; chunk lain tetap identik.
+    """
+    hashes = _rolling_hashes(text)
+    n = len(text)
+    chunks = []
+    start = 0
+    while start < n:
+        end = None
+        fallback = None
+        last_space = None
+        limit = min(start + max_size, n)
+        for i in range(start, limit):
+            kind = _anchor_kind(text, i)
+            if text[i].isspace():
+                last_space = i + 1
+            if kind is None or i + 1 - start < min_size:
+                continue
+            fallback = i + 1
+            if _is_cut(kind, hashes[i]):
+                end = i + 1
+                break
+
+        if end is None:
+            if limit == n:
+                end = n
+            else:
+                # Tidak ada anchor yang lolos: potong di anchor/spasi terakhir, atau paksa di max_size
+                end = fallback or last_space or limit
+                if end <= start:
+                    end = limit
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end
+    return chunks
+
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.sha1(chunk.encode("utf-8")).hexdigest()
+
+
+def make_chunk_ids(source_file: str, chunks: list) -> list:
+    """
+    Id deterministik per chunk: file sumber + hash isi + urutan kemunculan isi
+    yang sama di file tersebut (posisi di antara duplikat). Sengaja tidak memakai
+    nomor urut chunk di file, supaya sisipan di awal dokumen tidak mengubah id
+    semua chunk sesudahnya.
+    """
+    seen = {}
+    ids = []
+    for chunk in chunks:
+        digest = chunk_hash(chunk)[:16]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(f"{source_file}:{digest}:{occurrence}")
+    return ids
+
+
+def chunk_source(chunk_id: str) -> str:
+    """File sumber dari id buatan make_chunk_ids (nama file boleh mengandung ':')."""
+    return chunk_id.rsplit(":", 2)[0]
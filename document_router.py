@@ -0,0 +1,147 @@
+import os
+import threading
+
+import numpy as np
+
+from retrieval import normalize_vectors, reciprocal_rank_fusion
+
+
+class DocumentIndex:
+    """
+    Index tingkat dokumen: satu vektor per file sumber (rata-rata embedding chunk-nya
+    yang dinormalisasi), dihitung saat indexing dari embedding yang sudah ada tanpa
+    panggilan API tambahan. Saat query, pertanyaan dirutekan dulu ke beberapa dokumen
+    teratas, lalu pencarian chunk hanya dijalankan di dalam dokumen tersebut.
+
+    Seperti NumpyStore, setiap perubahan membangun state baru lalu menukarnya sekaligus.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats_counters = {"queries": 0, "routed": 0, "fallback_small_corpus": 0,
+                               "fallback_low_confidence": 0, "documents_searched": 0,
+                               "chunks_searched": 0, "chunks_total": 0}
+        self.dirty = False
+        self._state = self._load()
+
+    @staticmethod
+    def _make_state(files: list, matrix: np.ndarray, chunk_counts: list) -> tuple:
+        return list(files), np.ascontiguousarray(matrix, dtype=np.float32), list(chunk_counts)
+
+    def _load(self) -> tuple:
+        try:
+            with np.load(self.path) as data:
+                return self._make_state(data["files"].tolist(), data["vectors"], data["chunk_counts"].tolist())
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return self._make_state([], np.zeros((0, 0), dtype=np.float32), [])
+
+    def persist(self):
+        files, matrix, chunk_counts = self._state
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, files=np.array(files, dtype=str), vectors=matrix,
+                     chunk_counts=np.array(chunk_counts, dtype=np.int64))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._state[0])
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._state[0]
+
+    def files(self) -> list:
+        return list(self._state[0])
+
+    def set(self, filename: str, chunk_embeddings: list):
+        """Simpan vektor dokumen dari embedding semua chunk milik `filename`."""
+        if len(chunk_embeddings) == 0:
+            self.remove(filename)
+            return
+        centroid = normalize_vectors(normalize_vectors(chunk_embeddings).mean(axis=0))
+        with self._write_lock:
+            files, matrix, chunk_counts = self._state
+            files, chunk_counts = list(files), list(chunk_counts)
+            if filename in files:
+                row = files.index(filename)
+                matrix = matrix.copy()
+                matrix[row] = centroid
+                chunk_counts[row] = len(chunk_embeddings)
+            else:
+                files.append(filename)
+                chunk_counts.append(len(chunk_embeddings))
+                matrix = np.vstack([matrix, centroid]) if matrix.size else centroid[None, :]
+            self._state = self._make_state(files, matrix, chunk_counts)
+            self.dirty = True
+
+    def remove(self, filename: str):
+        with self._write_lock:
+            files, matrix, chunk_counts = self._state
+            if filename not in files:
+                return
+            keep = [row for row, name in enumerate(files) if name != filename]
+            self._state = self._make_state(
+                [files[r] for r in keep], matrix[keep], [chunk_counts[r] for r in keep]
+            )
+            self.dirty = True
+
+    def route(self, embedding: list, lexical_files: list, top_n: int, min_documents: int,
+              min_margin: float, rrf_k: int = 60):
+        """
+        Dokumen yang perlu dicari untuk satu pertanyaan, atau None jika pencarian
+        sebaiknya tetap di seluruh korpus (korpus kecil, atau rute tidak meyakinkan).
+
+        Peringkat dokumen dari kemiripan vektor dokumen digabung (RRF) dengan urutan
+        dokumen dari hasil BM25, supaya pertanyaan berisi identifier ("inpres 4")
+        tetap diarahkan ke dokumen yang menyebutnya.
+        """
+        files, matrix, chunk_counts = self._state
+        total_chunks = sum(chunk_counts)
+        if len(files) < max(min_documents, top_n + 1):
+            self._record("fallback_small_corpus", len(files), total_chunks, total_chunks)
+            return None
+
+        scores = matrix @ normalize_vectors(embedding)
+        order = np.argsort(-scores)
+        dense_files = [files[row] for row in order]
+        lexical_order = list(dict.fromkeys(name for name in lexical_files if name in self))
+        routed = reciprocal_rank_fusion([dense_files, lexical_order], k=rrf_k)[:top_n]
+        if lexical_order and lexical_order[0] not in routed:
+            routed[-1] = lexical_order[0]  # dokumen dengan hit BM25 terbaik selalu ikut dicari
+
+        # Yakin jika dokumen terbaik yang dirutekan jelas lebih mirip daripada dokumen terbaik yang ditinggalkan
+        score_of = dict(zip(files, scores.tolist()))
+        routed_set = set(routed)
+        best_left = max(score for name, score in score_of.items() if name not in routed_set)
+        if max(score_of[name] for name in routed) - best_left < min_margin:
+            self._record("fallback_low_confidence", len(files), total_chunks, total_chunks)
+            return None
+
+        chunk_of = dict(zip(files, chunk_counts))
+        self._record("routed", len(routed), sum(chunk_of[name] for name in routed), total_chunks)
+        return routed
+
+    def _record(self, outcome: str, documents: int, chunks_searched: int, chunks_total: int):
+        with self._stats_lock:
+            self.stats_counters["queries"] += 1
+            self.stats_counters[outcome] += 1
+            self.stats_counters["documents_searched"] += documents
+            self.stats_counters["chunks_searched"] += chunks_searched
+            self.stats_counters["chunks_total"] += chunks_total
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            counters = dict(self.stats_counters)
+        queries = counters.pop("queries")
+        searched = counters.pop("documents_searched")
+        chunks_searched = counters.pop("chunks_searched")
+        chunks_total = counters.pop("chunks_total")
+        return {
+            "documents": len(self),
+            "queries": queries,
+            **counters,
+            "avg_documents_searched": searched / queries if queries else 0.0,
+            "search_fraction": chunks_searched / chunks_total if chunks_total else 1.0,
+        }
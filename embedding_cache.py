@@ -0,0 +1,99 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Cache embedding persisten di disk (SQLite), dikunci dengan hash isi chunk
+    + nama model embedding + task type. Disimpan terpisah dari ./chroma_db,
+    jadi tetap utuh walaupun collection dihapus dan dibangun ulang.
+
+    Setiap `table` punya batas ukuran dan urutan LRU sendiri, jadi embedding
+    pertanyaan (tabel lain di file yang sama) tidak bisa mengusir embedding chunk.
+    """
+
+    def __init__(self, path: str = "embedding_cache.sqlite3", max_entries: int = 50000, table: str = "embeddings"):
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                   key TEXT PRIMARY KEY,
+                   model TEXT NOT NULL,
+                   vector BLOB NOT NULL,
+                   last_used REAL NOT NULL
+               )"""
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_used ON {table}(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, model: str, task_type: str) -> str:
+        return hashlib.sha256(f"{model}\0{task_type}\0{text}".encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get_many(self, texts: list, model: str, task_type: str, touch: bool = True) -> dict:
+        """
+        Mengembalikan {indeks_teks: embedding} untuk teks yang sudah ada di cache.
+        Dengan touch=False, waktu pakai tidak diperbarui (pemanggil memakai touch_many nanti).
+        """
+        keys = [self.make_key(t, model, task_type) for t in texts]
+        found = {}
+        with self._lock:
+            # Batasi jumlah parameter per query agar aman untuk batas SQLite
+            for start in range(0, len(keys), 500):
+                part = list(set(keys[start:start + 500]))
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM {self.table} WHERE key IN ({placeholders})", part
+                ).fetchall()
+                found.update({key: np.frombuffer(blob, dtype=np.float32).tolist() for key, blob in rows})
+
+            if found and touch:
+                self._touch(found)
+                self._conn.commit()
+        return {i: found[k] for i, k in enumerate(keys) if k in found}
+
+    def touch_many(self, texts: list, model: str, task_type: str):
+        """Tandai teks sebagai baru dipakai (urutan LRU)."""
+        with self._lock:
+            self._touch([self.make_key(t, model, task_type) for t in texts])
+            self._conn.commit()
+
+    def _touch(self, keys):
+        now = time.time()
+        self._conn.executemany(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", [(now, k) for k in keys])
+
+    def put_many(self, texts: list, embeddings: list, model: str, task_type: str):
+        now = time.time()
+        rows = [
+            (self.make_key(t, model, task_type), model, np.asarray(e, dtype=np.float32).tobytes(), now)
+            for t, e in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, model, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Buang entri yang paling lama tidak dipakai jika melebihi batas ukuran."""
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_used ASC LIMIT ?)", (excess,)
+            )
+            print(f"🧹 {excess} entri lama dibuang dari cache embedding ({self.table}).")
@@ -0,0 +1,60 @@
+import threading
+from collections import deque
+
+
+class HedgePolicy:
+    """
+    Kebijakan hedged request: kapan request cadangan dikirim dan berapa banyak.
+
+    Delay hedge = persentil latensi model utama (mis. p95), sehingga hanya request
+    yang lebih lambat dari biasanya yang di-hedge. Anggaran dihitung pada jendela
+    bergulir `window` panggilan terakhir: jumlah hedge tidak pernah melebihi
+    `max_ratio` dari panggilan di jendela itu.
+    """
+
+    def __init__(self, percentile: float = 95, min_delay: float = 0.5, default_delay: float = 3.0,
+                 min_samples: int = 20, max_ratio: float = 0.1, window: int = 1000):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self._calls = deque(maxlen=window)  # True = panggilan ini mengirim hedge
+        self._lock = threading.Lock()
+        self.stats_counters = {"calls": 0, "hedges": 0, "hedge_wins": 0, "budget_denied": 0}
+
+    def delay(self, latency_window) -> float:
+        """Delay sebelum hedge dikirim, dari jendela latensi model utama."""
+        if len(latency_window) < self.min_samples:
+            return self.default_delay
+        return max(latency_window.percentile(self.percentile), self.min_delay)
+
+    def start_call(self):
+        with self._lock:
+            self._calls.append(False)
+            self.stats_counters["calls"] += 1
+
+    def try_acquire(self) -> bool:
+        """Ambil satu jatah hedge jika anggaran di jendela masih cukup."""
+        with self._lock:
+            hedges = sum(self._calls)
+            if hedges + 1 > self.max_ratio * len(self._calls):
+                self.stats_counters["budget_denied"] += 1
+                return False
+            # Tandai panggilan terbaru yang belum di-hedge (urutan antar thread tidak penting untuk rasio)
+            for i in range(len(self._calls) - 1, -1, -1):
+                if not self._calls[i]:
+                    self._calls[i] = True
+                    break
+            self.stats_counters["hedges"] += 1
+            return True
+
+    def record_win(self):
+        with self._lock:
+            self.stats_counters["hedge_wins"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+            window_ratio = sum(self._calls) / len(self._calls) if self._calls else 0.0
+        return {**counters, "max_ratio": self.max_ratio, "window_hedge_ratio": window_ratio}
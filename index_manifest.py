@@ -0,0 +1,75 @@
+import json
+import os
+
+MANIFEST_VERSION = 2
+
+
+class IndexManifest:
+    """
+    Sidecar kecil untuk sinkronisasi index: menyimpan size, mtime, hash, dan
+    chunk id per file sumber. Dengan ini startup cukup melakukan `stat` per file,
+    tanpa membaca ulang isi file atau seluruh metadata collection.
+
+    `signature` mengikat manifest ke konfigurasi chunking + model embedding;
+    jika berbeda, manifest dianggap tidak valid dan index dibangun ulang.
+    """
+
+    def __init__(self, path: str, signature: str):
+        self.path = path
+        self.signature = signature
+        self.files = {}
+        self.valid = False
+        self.dirty = False
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if data.get("version") != MANIFEST_VERSION or data.get("signature") != self.signature:
+            print("⚠️ Manifest index berasal dari konfigurasi lama, index akan dibangun ulang.")
+            return False
+        self.files = data.get("files", {})
+        self.valid = True
+        return True
+
+    def invalidate(self):
+        """Paksa index dibangun ulang pada sinkronisasi berikutnya."""
+        self.files = {}
+        self.valid = False
+
+    def save(self):
+        """Tulis atomik (file sementara + os.replace) agar manifest tidak pernah setengah jadi."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {"version": MANIFEST_VERSION, "signature": self.signature, "files": self.files},
+                f, ensure_ascii=False
+            )
+        os.replace(tmp_path, self.path)
+        self.valid = True
+        self.dirty = False
+
+    def get(self, filename: str):
+        return self.files.get(filename)
+
+    def is_unchanged(self, filename: str, size: int, mtime_ns: int) -> bool:
+        entry = self.files.get(filename)
+        return bool(entry) and entry["size"] == size and entry["mtime_ns"] == mtime_ns
+
+    def set(self, filename: str, size: int, mtime_ns: int, file_hash: str, chunk_ids: list):
+        self.files[filename] = {
+            "size": size, "mtime_ns": mtime_ns, "hash": file_hash, "chunk_ids": list(chunk_ids)
+        }
+        self.dirty = True
+
+    def touch(self, filename: str, size: int, mtime_ns: int):
+        """Isi file sama (hash cocok), hanya stat yang berubah."""
+        self.files[filename].update({"size": size, "mtime_ns": mtime_ns})
+        self.dirty = True
+
+    def remove(self, filename: str):
+        if self.files.pop(filename, None) is not None:
+            self.dirty = True
@@ -0,0 +1,36 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class LatencyWindow:
+    """Jendela bergulir sampel latensi (detik) untuk menghitung persentil di /metrics."""
+
+    def __init__(self, max_samples: int = 1000):
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def percentile(self, pct: float):
+        """Persentil dalam detik, atau None jika belum ada sampel."""
+        with self._lock:
+            samples = list(self._samples)
+        return float(np.percentile(samples, pct)) if samples else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = list(self._samples)
+            count = self.count
+        if not samples:
+            return {"count": count, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+        return {"count": count, "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
@@ -0,0 +1,78 @@
+"""
+Load test endpoint /chat: throughput (request/detik) dan latensi (p50/p99) pada
+beberapa tingkat konkurensi, dibandingkan dengan konkurensi 1.
+
+Setiap request memakai session_id baru (tanpa riwayat), jadi pertanyaannya
+dianggap mandiri. Supaya tidak dilayani cache jawaban (persis maupun semantik)
+atau digabung single-flight, setiap request diberi nomor unik di akhir pesan;
+cache semantik hanya menerima hit jika angka di kedua pertanyaan sama. Dengan
+begitu setiap request melewati jalur RAG penuh (embedding, retrieval, Gemini).
+
+Jalankan (server harus sudah hidup):
+    uvicorn chatbot:app --port 8000
+    python load_test.py --url http://localhost:8000 --concurrency 1,4,8 --requests 32
+"""
+import argparse
+import itertools
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+DEFAULT_MESSAGE = "jelaskan lebih lanjut tentang pemutakhiran data DTSEN"
+_request_numbers = itertools.count(int(time.time()))
+
+
+def send(url: str, message: str, timeout: float) -> tuple:
+    # Nomor unik per request (juga antar run): bukan cache hit, bukan duplikat in-flight
+    unique_message = f"{message} (permintaan {next(_request_numbers)})"
+    start = time.perf_counter()
+    try:
+        response = requests.post(
+            f"{url}/chat", json={"message": unique_message, "session_id": uuid.uuid4().hex}, timeout=timeout
+        )
+        ok = response.status_code == 200
+    except requests.RequestException:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def run_level(url: str, concurrency: int, total: int, message: str, timeout: float) -> dict:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: send(url, message, timeout), range(total)))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for ok, latency in results if ok]
+    return {
+        "ok": len(latencies),
+        "failed": total - len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000) if latencies else 0.0,
+        "p99_ms": float(np.percentile(latencies, 99) * 1000) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--requests", type=int, default=32, help="jumlah request per tingkat konkurensi")
+    parser.add_argument("--message", default=DEFAULT_MESSAGE)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/")
+    print(f"📊 {args.requests} request per tingkat ke {url}/chat")
+    baseline = None
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        result = run_level(url, concurrency, args.requests, args.message, args.timeout)
+        baseline = baseline or result["throughput"]
+        speedup = result["throughput"] / baseline if baseline else 0.0
+        print(f"- konkurensi {concurrency:>3}: {result['throughput']:7.2f} req/s ({speedup:4.1f}x) | "
+              f"p50 {result['p50_ms']:8.1f} ms | p99 {result['p99_ms']:8.1f} ms | gagal {result['failed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,11 @@ import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 from google.api_core import exceptions as google_exceptions
 import os
-import json
-import uuid
 import hashlib # Untuk membuat hash file
+import re
 import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from dotenv import load_dotenv
 
 # Panggil fungsi load_dotenv() di awal skrip
@@ -26,7 +27,26 @@ try:
 except ImportError:
     pass
 
-import chromadb
+import chunker
+from bm25_index import BM25Index
+from chat_store import ChatStore, DEFAULT_SESSION_ID
+from chunker import chunk_source, chunk_text, make_chunk_ids
+from document_router import DocumentIndex
+from embedding_cache import EmbeddingCache
+from hedging import HedgePolicy
+from index_manifest import IndexManifest
+from latency import LatencyWindow
+from micro_batcher import MicroBatcher
+from model_router import ModelRouter
+from prompt_builder import PromptBuilder, estimate_tokens
+from query_embedding_cache import QueryEmbeddingCache
+from query_rewriter import QueryRewriter
+from rate_limiter import BACKGROUND, INTERACTIVE, RateLimiter
+from retrieval import merge_adjacent, mmr_select, reciprocal_rank_fusion
+from semantic_cache import SemanticCache
+from sessions import SessionStore
+from singleflight import SingleFlight
+from vector_store import create_vector_store
 
 # (PROMPT_TEMPLATES dan AVAILABLE_MODELS tetap sama)
 
@@ -47,7 +67,34 @@ PROMPT_TEMPLATES = {
                         </informasi_terkumpul_untuk_pertanyaan_baru>
 
                         Pertanyaan Baru Pengguna: {user_question}
-                        Jawaban Akhir yang Ringkas:"""
+                        Jawaban Akhir yang Ringkas:""",
+    "summarizer": """Perbarui ringkasan percakapan antara pengguna dan asisten berikut.
+                    Pertahankan fakta penting (nama peraturan, nomor, tahun, angka, keputusan) dan topik yang sedang dibahas.
+                    Tulis dalam Bahasa Indonesia, maksimal 120 kata, tanpa kalimat pembuka.
+
+                        <ringkasan_sebelumnya>
+                        {previous_summary}
+                        </ringkasan_sebelumnya>
+
+                        <giliran_baru>
+                        {conversation}
+                        </giliran_baru>
+
+                        Ringkasan Terbaru:""",
+    "condenser": """Tulis ulang pertanyaan terakhir pengguna menjadi satu pertanyaan mandiri yang bisa dipahami tanpa riwayat percakapan.
+                    Ganti kata rujukan (itu, tersebut, tadi, -nya) dengan hal yang dimaksud. Jangan menjawab pertanyaannya.
+                    Jika pertanyaan sudah mandiri, tulis ulang apa adanya. Keluarkan HANYA pertanyaan hasil tulis ulang.
+
+                        <ringkasan_percakapan>
+                        {summary}
+                        </ringkasan_percakapan>
+
+                        <riwayat_percakapan>
+                        {conversation}
+                        </riwayat_percakapan>
+
+                        Pertanyaan Terakhir: {question}
+                        Pertanyaan Mandiri:"""
 }
 
 AVAILABLE_MODELS = [
@@ -62,6 +109,121 @@ AVAILABLE_MODELS = [
     "models/gemini-1.5-flash-latest"
 ]
 
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+# Jawaban dengan awalan ini tidak disimpan ke riwayat maupun cache
+INVALID_ANSWER_PREFIXES = ("Maaf,", "❌")
+
+# Folder yang berisi dokumen sumber
+SOURCE_FOLDER_PATH = "bahan-chatbot/txt/"
+
+# Pengaturan pipeline embedding saat indexing
+EMBED_BATCH_SIZE = 100      # batas maksimum satu panggilan batch_embed_contents
+EMBED_MAX_WORKERS = 4       # jumlah batch yang dikirim bersamaan
+EMBED_MAX_RETRIES = 3       # percobaan per batch sebelum menyerah
+EMBED_RETRY_BACKOFF = 1.0   # detik, dilipatgandakan tiap percobaan ulang
+
+# Backend vector store: "chroma" (default), "numpy" (exact search di dalam proses),
+# atau "faiss" (flat/IVF/HNSW + mmap, untuk korpus besar; butuh faiss-cpu)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+CHROMA_PATH = "./chroma_db"
+COLLECTION_NAME = "dokumen_utama"
+NUMPY_INDEX_PATH = "./numpy_index"
+FAISS_INDEX_PATH = "./faiss_index"   # bukan ./vectorstore_index (index LangChain lama, model embedding lain)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")   # auto | flat | ivf | hnsw
+FAISS_IVF_MIN_VECTORS = 20000   # mode auto: di bawah ini exact (flat), di atasnya IVF
+FAISS_IVF_NPROBE = 16
+FAISS_HNSW_M = 32
+FAISS_HNSW_EF_SEARCH = 64
+# Manifest disimpan di dalam folder index masing-masing backend: ikut hilang jika folder itu dihapus
+
+# Retrieval hibrida: dense + BM25 digabung dengan Reciprocal Rank Fusion
+RETRIEVAL_TOP_K = 3
+RETRIEVAL_CANDIDATES = 10   # kandidat per retriever sebelum fusion
+RRF_K = 60
+# Rerank pasca-retrieval: ambil lebih banyak kandidat fusion, gabungkan chunk yang
+# bertetangga di file yang sama, lalu pilih hasil akhir dengan MMR
+RERANK_POOL_SIZE = 12
+RERANK_MAX_MERGED_CHUNKS = 3
+MMR_LAMBDA = 0.7
+# Routing dokumen: pertanyaan diarahkan dulu ke beberapa dokumen teratas (vektor per
+# dokumen), lalu chunk hanya dicari di dalam dokumen tersebut
+DOC_ROUTING_ENABLED = os.getenv("DOC_ROUTING_ENABLED", "1") == "1"
+DOC_ROUTE_TOP_N = 3
+DOC_ROUTE_MIN_DOCUMENTS = 6    # korpus lebih kecil dari ini tetap dicari seluruhnya
+DOC_ROUTE_MIN_MARGIN = 0.01    # selisih cosine minimum terhadap dokumen terbaik yang ditinggalkan
+
+# Cache jawaban semantik: jawaban dipakai ulang jika pertanyaan cukup mirip maknanya
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+SEMANTIC_CACHE_TTL_SECONDS = 30 * 24 * 3600
+
+# Riwayat percakapan & cache jawaban disimpan di SQLite (history.json/cache.json lama diimpor sekali)
+CHAT_STORE_PATH = "chatbot_store.sqlite3"
+
+# Riwayat per sesi di memori: giliran per sesi, masa idle, dan batas total memori
+SESSION_MAX_TURNS = 10
+SESSION_IDLE_TTL_SECONDS = 30 * 60
+SESSION_MAX_COUNT = 1000
+SESSION_MAX_TOTAL_CHARS = 5_000_000
+
+# Anggaran prompt: konteks dulu, lalu giliran terbaru; giliran yang lebih lama
+# dilipat ke ringkasan bergulir per sesi (dibuat di background dengan model ringan)
+PROMPT_MAX_TOKENS = 4000
+SESSION_RECENT_TURNS = 4
+SUMMARY_MODEL = "models/gemini-2.0-flash-lite"
+
+# Kondensasi pertanyaan lanjutan menjadi pertanyaan mandiri (model ringan + memo)
+CONDENSE_MODEL = SUMMARY_MODEL
+CONDENSE_HISTORY_TURNS = 3
+SHORT_QUESTION_MAX_WORDS = 3  # "lalu?", "terus gimana": selalu ditulis ulang dari riwayat, tidak pernah di-cache apa adanya
+CONDENSE_MEMO_MAX_ENTRIES = 1000
+
+# Router model: circuit breaker per model menggantikan fallback berurutan
+ROUTER_FAILURE_THRESHOLD = 3              # gagal berturut-turut sebelum circuit dibuka
+ROUTER_COOLDOWN_SECONDS = 30              # cooldown awal, berlipat tiap kali dibuka lagi
+ROUTER_MAX_COOLDOWN_SECONDS = 600
+ROUTER_RATE_LIMIT_COOLDOWN_SECONDS = 60   # cooldown setelah 429 / kuota habis
+ROUTER_PROBE_INTERVAL_SECONDS = 15
+
+# Hedged request (opsional): jika model utama belum menjawab setelah persentil
+# latensinya, prompt yang sama dikirim ke model sehat berikutnya; maks 10% panggilan
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "0") == "1"
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_DELAY_SECONDS = 0.5
+HEDGE_DEFAULT_DELAY_SECONDS = 3.0   # dipakai sebelum sampel latensi model utama cukup
+HEDGE_MAX_RATIO = 0.1
+
+# Kuota Gemini di sisi klien (request per menit, burst) per model dan jenis endpoint.
+# Sesuaikan dengan tier API key; request interaktif didahulukan dari indexing/background.
+RATE_LIMIT_DEFAULTS = {
+    "generate": (int(os.getenv("GEMINI_GENERATE_RPM", "60")), 5),
+    "embed": (int(os.getenv("GEMINI_EMBED_RPM", "1500")), 50),
+}
+MODEL_RATE_LIMITS = {
+    # "models/gemini-2.5-flash": (10, 2),
+}
+
+# Konkurensi API: get_response (blocking) dijalankan di executor terbatas, bukan di event loop
+CHAT_MAX_WORKERS = int(os.getenv("CHAT_MAX_WORKERS", "8"))
+CHAT_MAX_PENDING = 64       # request yang sedang diproses + antri; lebih dari ini dijawab 503
+
+# Micro-batching: embedding pertanyaan & query dense dari request yang datang bersamaan
+# dikumpulkan selama beberapa milidetik lalu dikirim dalam satu panggilan batch
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "1") == "1"
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5"))
+MICRO_BATCH_MAX_SIZE = 32
+MICRO_BATCH_WORKERS = 4     # batch yang boleh diproses bersamaan per jenis panggilan
+
+# Cache embedding persisten (di luar ./chroma_db supaya tidak ikut terhapus)
+EMBED_CACHE_PATH = "embedding_cache.sqlite3"
+EMBED_CACHE_MAX_ENTRIES = 50000
+
+# Cache embedding pertanyaan (LRU di memori, opsional ikut disimpan di EMBED_CACHE_PATH)
+QUERY_EMBED_CACHE_MAX_ENTRIES = 2000
+QUERY_EMBED_CACHE_DISK_MAX_ENTRIES = 20000  # tabel terpisah, tidak mengusir embedding chunk
+QUERY_EMBED_CACHE_PERSIST = os.getenv("QUERY_EMBED_CACHE_PERSIST", "1") == "1"
+
 
 # ======== Chatbot dengan Arsitektur Final (Vector RAG + Fallback) ========
 class VectorRAGChatbot:
@@ -73,35 +235,221 @@ class VectorRAGChatbot:
         self.cache_path = "cache.json"
         self.model_names = model_names
         self.models = self._initialize_models()
-        self.current_model_index = 0
-        self.db_client = chromadb.PersistentClient(path="./chroma_db")
-        self.collection = self.db_client.get_or_create_collection(name="dokumen_utama")
-        self.history = self._load_from_json(self.history_path, default=[])
-        self.qa_cache = self._load_from_json(self.cache_path, default={})
+        self.rate_limiter = RateLimiter(MODEL_RATE_LIMITS, RATE_LIMIT_DEFAULTS)
+        self.router = ModelRouter(
+            self.models,
+            probe=self._probe_model,
+            rate_limit_errors=(google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests),
+            failure_threshold=ROUTER_FAILURE_THRESHOLD,
+            base_cooldown=ROUTER_COOLDOWN_SECONDS,
+            max_cooldown=ROUTER_MAX_COOLDOWN_SECONDS,
+            rate_limit_cooldown=ROUTER_RATE_LIMIT_COOLDOWN_SECONDS,
+            probe_interval=ROUTER_PROBE_INTERVAL_SECONDS,
+        )
+        self.router.start()
+        self.hedger = HedgePolicy(
+            percentile=HEDGE_PERCENTILE,
+            min_delay=HEDGE_MIN_DELAY_SECONDS,
+            default_delay=HEDGE_DEFAULT_DELAY_SECONDS,
+            max_ratio=HEDGE_MAX_RATIO,
+        )
+        self._hedge_executor = ThreadPoolExecutor(max_workers=2 * CHAT_MAX_WORKERS, thread_name_prefix="hedge")
+        self.store = self._create_vector_store(VECTOR_BACKEND)
+        self.manifest = IndexManifest(self.store.manifest_path, signature=self._index_signature())
+        self.manifest.load()
+        self.bm25 = BM25Index(os.path.join(self.store.path, "bm25_index.json"))
+        self.documents = DocumentIndex(os.path.join(self.store.path, "document_vectors.npz"))
+        if self.manifest.valid and not self.bm25.loaded:
+            print("⚠️ Index BM25 belum ada, index akan dibangun ulang.")
+            self.manifest.invalidate()
+        self._hidden_ids = frozenset()
+        self._sync_lock = threading.Lock()
+        self.sync_status = {"state": "idle"}
+        self.embedding_cache = EmbeddingCache(EMBED_CACHE_PATH, max_entries=EMBED_CACHE_MAX_ENTRIES)
+        self.embed_batcher = MicroBatcher(
+            self._embed_query_batch, max_batch_size=MICRO_BATCH_MAX_SIZE,
+            max_wait=MICRO_BATCH_MAX_WAIT_MS / 1000, workers=MICRO_BATCH_WORKERS, name="embed-batcher"
+        )
+        self.query_batcher = MicroBatcher(
+            self._query_store_batch, max_batch_size=MICRO_BATCH_MAX_SIZE,
+            max_wait=MICRO_BATCH_MAX_WAIT_MS / 1000, workers=MICRO_BATCH_WORKERS, name="query-batcher"
+        )
+        self.query_embeddings = QueryEmbeddingCache(
+            EMBEDDING_MODEL,
+            max_entries=QUERY_EMBED_CACHE_MAX_ENTRIES,
+            persistent=EmbeddingCache(
+                EMBED_CACHE_PATH, max_entries=QUERY_EMBED_CACHE_DISK_MAX_ENTRIES, table="query_embeddings"
+            ) if QUERY_EMBED_CACHE_PERSIST else None,
+        )
+        self.chat_store = ChatStore(CHAT_STORE_PATH)
+        self.chat_store.import_legacy_json(self.history_path, self.cache_path)
+        self.sessions = SessionStore(
+            self.chat_store,
+            max_turns=SESSION_MAX_TURNS,
+            idle_ttl=SESSION_IDLE_TTL_SECONDS,
+            max_sessions=SESSION_MAX_COUNT,
+            max_total_chars=SESSION_MAX_TOTAL_CHARS,
+        )
+        self.prompt_builder = PromptBuilder(PROMPT_TEMPLATES["synthesizer"], max_tokens=PROMPT_MAX_TOKENS)
+        self._summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-summary")
+        self.rerank_stats = {"requests": 0, "merged_spans": 0, "baseline_tokens": 0, "selected_tokens": 0,
+                             "tokens_saved": 0}
+        self._rerank_lock = threading.Lock()
+        self.query_rewriter = QueryRewriter(PROMPT_TEMPLATES["condenser"], max_entries=CONDENSE_MEMO_MAX_ENTRIES)
+        self.singleflight = SingleFlight()   # pertanyaan mandiri identik yang sedang diproses
+        self.ttft = LatencyWindow()             # waktu sampai potongan jawaban pertama (streaming)
+        self.stream_duration = LatencyWindow()  # waktu sampai stream selesai
+        self.qa_cache = SemanticCache(
+            self.chat_store,
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+            ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+        )
         if self.models:
             print(f"✅ VectorRAGChatbot berhasil diinisialisasi dengan model utama: '{self.get_current_model().model_name}'")
         else:
             print("❌ Gagal memuat model.")
 
-    # (... Semua fungsi helper seperti _load_from_json, _get_embedding, _initialize_models, dll tetap sama ...)
-    # --- Fungsi Helper untuk JSON ---
-    def _load_from_json(self, filepath: str, default=None):
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return default
+    # --- Fungsi Helper untuk Riwayat ---
+    def _remember(self, session_id: str, question: str, answer: str, keep: int = SESSION_RECENT_TURNS):
+        """
+        Tambah satu giliran ke riwayat sesi (dibatasi di memori) dan append ke penyimpanan.
+        Giliran di luar `keep` giliran terbaru dilipat ke ringkasan sesi di background.
+        """
+        self.sessions.append(session_id, question, answer)
+        self._schedule_summary(session_id, keep)
 
-    def _save_to_json(self, filepath: str, data):
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+    def _schedule_summary(self, session_id: str, keep: int):
+        """Lipat giliran di luar `keep` giliran terbaru ke ringkasan sesi, tanpa menahan request."""
+        pending = self.sessions.take_for_summary(session_id, keep)
+        if pending is not None:
+            self._summary_executor.submit(self._summarize_session, session_id, *pending)
+
+    def _summarize_session(self, session_id: str, previous_summary: str, turns: list):
+        summary = None
+        try:
+            candidates = self.router.candidates()
+            model = next((m for m in candidates if m.model_name == SUMMARY_MODEL), candidates[0])
+            prompt = PROMPT_TEMPLATES["summarizer"].format(
+                previous_summary=previous_summary or "(belum ada)",
+                conversation="\n".join(f"Pengguna: {q}\nAsisten: {a}" for q, a in turns),
+            )
+            result = self._attempt_model(prompt, model, priority=BACKGROUND).strip()
+            if result and not result.startswith("❌"):
+                summary = result
+                print(f"📝 Ringkasan sesi {session_id} diperbarui ({len(turns)} giliran dilipat).")
+        except Exception as e:
+            print(f"⚠️ Gagal meringkas riwayat sesi {session_id}: {e}")
+        finally:
+            self.sessions.apply_summary(session_id, summary, turns)
 
     # --- Fungsi Helper untuk Embedding ---
-    def _get_embedding(self, text: str, task_type: str):
+    def _get_embedding(self, text: str, task_type: str, priority: int = INTERACTIVE):
+        if MICRO_BATCH_ENABLED and priority == INTERACTIVE:
+            return self.embed_batcher.submit(text, key=task_type)
+        self.rate_limiter.acquire("embed", EMBEDDING_MODEL, priority)
         return genai.embed_content(
-            model="models/text-embedding-004", content=text, task_type=task_type
+            model=EMBEDDING_MODEL, content=text, task_type=task_type
         )["embedding"]
 
+    def _embed_query_batch(self, task_type: str, texts: list) -> list:
+        """Dipanggil embed_batcher: pertanyaan dari beberapa request dalam satu panggilan API."""
+        self.rate_limiter.acquire("embed", EMBEDDING_MODEL, INTERACTIVE)
+        return genai.embed_content(model=EMBEDDING_MODEL, content=texts, task_type=task_type)["embedding"]
+
+    def _query_store_batch(self, n_results: int, items: list) -> list:
+        """
+        Dipanggil query_batcher: satu query vector store untuk embedding dari beberapa
+        request. Filter (chunk tersembunyi, dokumen hasil routing) ikut di setiap item,
+        jadi request dengan rute berbeda tetap masuk batch yang sama.
+        """
+        embeddings = [embedding for embedding, _ in items]
+        return self.store.query_batch(embeddings, n_results=n_results, filters=[filters for _, filters in items])
+
+    def _dense_search(self, embedding: list, exclude_ids: frozenset, source_files=None) -> list:
+        if not MICRO_BATCH_ENABLED:
+            return self.store.query(
+                embedding, n_results=RETRIEVAL_CANDIDATES, exclude_ids=exclude_ids, source_files=source_files
+            )
+        return self.query_batcher.submit((embedding, (exclude_ids, source_files)), key=RETRIEVAL_CANDIDATES)
+
+    def _embed_batch(self, texts: list, task_type: str, priority: int = BACKGROUND) -> list:
+        """Meng-embed satu batch teks dalam satu panggilan API, dengan retry per batch."""
+        for attempt in range(1, EMBED_MAX_RETRIES + 1):
+            self.rate_limiter.acquire("embed", EMBEDDING_MODEL, priority)
+            try:
+                return genai.embed_content(
+                    model=EMBEDDING_MODEL, content=texts, task_type=task_type
+                )["embedding"]
+            except Exception as e:
+                if attempt == EMBED_MAX_RETRIES:
+                    raise
+                wait = EMBED_RETRY_BACKOFF * (2 ** (attempt - 1))
+                print(f"⚠️ Batch embedding gagal (percobaan {attempt}/{EMBED_MAX_RETRIES}): {e}. Coba lagi dalam {wait:.1f} detik...")
+                time.sleep(wait)
+
+    def _embed_documents(self, chunks: list, task_type: str = "RETRIEVAL_DOCUMENT", progress=None) -> list:
+        """
+        Meng-embed banyak chunk sekaligus: dipecah per batch, lalu beberapa batch
+        dikirim bersamaan. Urutan hasil selalu sama dengan urutan `chunks`.
+        """
+        if not chunks:
+            return []
+
+        # Ambil dulu yang sudah pernah di-embed; hanya chunk yang benar-benar baru dikirim ke API
+        embeddings = [None] * len(chunks)
+        for idx, emb in self.embedding_cache.get_many(chunks, EMBEDDING_MODEL, task_type).items():
+            embeddings[idx] = emb
+        missing = [i for i, emb in enumerate(embeddings) if emb is None]
+        print(f"   -> ♻️ {len(chunks) - len(missing)}/{len(chunks)} chunk diambil dari cache embedding.")
+        done = len(chunks) - len(missing)
+        if progress:
+            progress(done)
+        if not missing:
+            return embeddings
+
+        start = time.perf_counter()
+        texts = [chunks[i] for i in missing]
+        batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+        results = [None] * len(batches)
+        with ThreadPoolExecutor(max_workers=min(EMBED_MAX_WORKERS, len(batches))) as executor:
+            futures = {executor.submit(self._embed_batch, batch, task_type): idx for idx, batch in enumerate(batches)}
+            for future in as_completed(futures):
+                batch_idx = futures[future]
+                results[batch_idx] = future.result()
+                # Simpan per batch, jadi batch yang sudah berhasil tidak diulang kalau batch lain gagal
+                self.embedding_cache.put_many(batches[batch_idx], results[batch_idx], EMBEDDING_MODEL, task_type)
+                done += len(batches[batch_idx])
+                if progress:
+                    progress(done)
+
+        new_embeddings = [emb for batch in results for emb in batch]
+        for i, emb in zip(missing, new_embeddings):
+            embeddings[i] = emb
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        print(f"   -> {len(texts)} chunk di-embed dalam {elapsed:.2f} detik "
+              f"({len(texts) / elapsed:.1f} chunk/detik, {len(batches)} batch)")
+        return embeddings
+
+    @staticmethod
+    def _create_vector_store(backend: str):
+        if backend == "chroma":
+            return create_vector_store("chroma", path=CHROMA_PATH, collection_name=COLLECTION_NAME)
+        if backend == "numpy":
+            return create_vector_store("numpy", path=NUMPY_INDEX_PATH)
+        if backend == "faiss":
+            return create_vector_store(
+                "faiss", path=FAISS_INDEX_PATH, index_type=FAISS_INDEX_TYPE, ivf_min_vectors=FAISS_IVF_MIN_VECTORS,
+                nprobe=FAISS_IVF_NPROBE, hnsw_m=FAISS_HNSW_M, ef_search=FAISS_HNSW_EF_SEARCH,
+            )
+        return create_vector_store(backend)
+
+    @staticmethod
+    def _index_signature() -> str:
+        """Konfigurasi yang memengaruhi isi index; jika berubah, index perlu dibangun ulang."""
+        return (f"{EMBEDDING_MODEL}|cdc-{chunker.CHUNK_MIN_SIZE}-{chunker.CHUNK_MAX_SIZE}"
+                f"-{chunker.PARAGRAPH_MASK_BITS}-{chunker.SENTENCE_MASK_BITS}")
+
     # --- Fungsi Helper untuk Model Fallback ---
     def _initialize_models(self) -> list:
         models = []
@@ -119,17 +467,12 @@ class VectorRAGChatbot:
 
     def get_current_model(self):
         if not self.models: return None
-        return self.models[self.current_model_index]
+        return self.router.candidates()[0]
 
-    def _switch_to_next_model(self) -> bool:
-        next_index = self.current_model_index + 1
-        if next_index < len(self.models):
-            self.current_model_index = next_index
-            print(f"🔄 Beralih ke model fallback: {self.get_current_model().model_name}")
-            return True
-        else:
-            print("❌ Semua model fallback telah dicoba dan gagal.")
-            return False
+    def _probe_model(self, model):
+        """Request sekecil mungkin untuk mengecek apakah model yang circuit-nya terbuka sudah pulih."""
+        self.rate_limiter.acquire("generate", model.model_name, BACKGROUND)
+        model.generate_content("ping", generation_config={"max_output_tokens": 1})
 
     def _call_model(self, prompt: str, model) -> str:
         try:
@@ -140,194 +483,740 @@ class VectorRAGChatbot:
             raise e
 
     def _call_model_with_fallback(self, prompt: str) -> str:
+        """
+        Coba model yang sehat menurut router, sesuai urutan prioritas. Model yang
+        circuit-nya terbuka (error/429 berulang) dilewati tanpa biaya latensi.
+        """
         if not self.models: return "❌ Tidak ada model yang bisa digunakan."
+        candidates = self.router.candidates()
+        if HEDGE_ENABLED and len(candidates) > 1:
+            answer, tried = self._call_model_hedged(prompt, candidates[0], candidates[1])
+            if answer is not None:
+                return answer
+            candidates = [m for m in candidates if m not in tried]
+        for index, model in enumerate(candidates):
+            if index:
+                print(f"🔄 Beralih ke model fallback: {model.model_name}")
+            try:
+                print(f"🧠 Mencoba menghasilkan jawaban dengan: {model.model_name}...")
+                return self._attempt_model(prompt, model)
+            except Exception:
+                continue
+        print("❌ Semua model fallback telah dicoba dan gagal.")
+        return "Maaf, semua model sedang mengalami gangguan atau limit. Silakan coba lagi nanti."
+
+    def _attempt_model(self, prompt: str, model, priority: int = INTERACTIVE) -> str:
+        """
+        Satu panggilan model yang hasilnya (sukses/gagal + latensi) dilaporkan ke router.
+        Latensi diukur setelah token rate limiter didapat: waktu antri di sisi klien
+        sudah tercatat di statistik rate limiter dan bukan kelambatan model.
+        """
+        self.rate_limiter.acquire("generate", model.model_name, priority)
+        start = time.perf_counter()
         try:
-            current_model = self.get_current_model()
-            print(f"🧠 Mencoba menghasilkan jawaban dengan: {current_model.model_name}...")
-            return self._call_model(prompt, current_model)
-        except Exception:
-            if self._switch_to_next_model():
-                return self._call_model_with_fallback(prompt) # Coba lagi rekursif
-            else:
-                return "Maaf, semua model sedang mengalami gangguan atau limit. Silakan coba lagi nanti."
+            answer = self._call_model(prompt, model)
+        except Exception as e:
+            self.router.record_failure(model, e)
+            raise
+        self.router.record_success(model, time.perf_counter() - start)
+        return answer
+
+    def _call_model_hedged(self, prompt: str, primary, backup) -> tuple:
+        """
+        Kirim prompt ke model utama; jika belum selesai setelah delay persentil (dan
+        anggaran hedge masih ada), kirim juga ke `backup` dan ambil yang lebih dulu
+        berhasil. Mengembalikan (jawaban|None, model yang sudah dicoba).
+        Panggilan SDK yang sudah berjalan tidak bisa dihentikan: hasil yang kalah
+        dibuang, hanya yang belum mulai yang dibatalkan.
+        """
+        self.hedger.start_call()
+        delay = self.hedger.delay(self.router.latency_window(primary))
+        print(f"🧠 Mencoba menghasilkan jawaban dengan: {primary.model_name} (hedge setelah {delay * 1000:.0f} ms)...")
+        futures = {self._hedge_executor.submit(self._attempt_model, prompt, primary): primary}
+        done, _ = wait(futures, timeout=delay, return_when=FIRST_COMPLETED)
+        if not done and self.hedger.try_acquire():
+            print(f"🪃 {primary.model_name} belum menjawab, hedge ke {backup.model_name}")
+            futures[self._hedge_executor.submit(self._attempt_model, prompt, backup)] = backup
+
+        for future in as_completed(futures):
+            try:
+                answer = future.result()
+            except Exception:
+                continue
+            if futures[future] is backup:
+                self.hedger.record_win()
+            for other in futures:
+                other.cancel()
+            return answer, set(futures.values())
+        return None, set(futures.values())
+
+    def _stream_model_with_fallback(self, prompt: str):
+        """
+        Versi streaming dari _call_model_with_fallback. Pindah ke model berikutnya
+        hanya mungkin sebelum potongan pertama terkirim; galat setelahnya diteruskan.
+        """
+        if not self.models:
+            yield "❌ Tidak ada model yang bisa digunakan."
+            return
+        for index, model in enumerate(self.router.candidates()):
+            if index:
+                print(f"🔄 Beralih ke model fallback: {model.model_name}")
+            started = False
+            try:
+                print(f"🧠 Streaming jawaban dengan: {model.model_name}...")
+                self.rate_limiter.acquire("generate", model.model_name, INTERACTIVE)
+                start = time.perf_counter()  # antrian rate limiter bukan latensi model
+                for chunk in model.generate_content(prompt, stream=True):
+                    if chunk.parts:
+                        started = True
+                        yield chunk.text
+                if not started:
+                    yield "❌ Respons diblokir oleh filter keamanan."
+            except Exception as e:
+                self.router.record_failure(model, e)
+                if started:
+                    raise
+                print(f"🔴 Gagal dengan model '{model.model_name}': {e}")
+                continue
+            self.router.record_success(model, time.perf_counter() - start)
+            return
+        print("❌ Semua model fallback telah dicoba dan gagal.")
+        yield "Maaf, semua model sedang mengalami gangguan atau limit. Silakan coba lagi nanti."
 
     # Di dalam kelas VectorRAGChatbot
 
     def _is_context_dependent(self, question: str) -> bool:
         """
         Mendeteksi apakah pertanyaan kemungkinan besar bergantung pada konteks.
-        Ini adalah pendekatan heuristik sederhana menggunakan kata kunci.
+        Ini adalah pendekatan heuristik sederhana menggunakan kata kunci, dicocokkan
+        per kata utuh (bukan substring), jadi "apa itu DTSEN" tetap dianggap mandiri.
         """
-        question = question.lower().strip()
-        # Daftar kata kunci yang menandakan ketergantungan pada konteks
+        tokens = re.findall(r"[0-9a-z]+", question.lower())
+        text = " ".join(tokens)
+        # Kata/frasa yang menandakan ketergantungan pada konteks
         CONTEXT_KEYWORDS = [
-            "itu", "tadi", "sebelumnya", "lagi dong", 
-            "bagaimana dengan", "kenapa begitu", "maksudnya apa",
-            "lebih lanjut", "detailnya"
+            "tadi", "sebelumnya", "tersebut", "lagi dong",
+            "bagaimana dengan", "kenapa begitu", "maksudnya apa", "maksudnya",
+            "lebih lanjut", "detailnya", "yang itu"
         ]
-        
-        # Juga anggap pertanyaan yang sangat pendek sebagai context-dependent
-        if len(question.split()) <= 3:
-            return True
-            
         for keyword in CONTEXT_KEYWORDS:
-            if keyword in question:
+            if re.search(rf"\b{keyword}\b", text):
                 print(f"   -> Pertanyaan terdeteksi bergantung pada konteks (keyword: '{keyword}')")
                 return True
+
+        # "itu" di akhir kalimat merujuk ke hal sebelumnya ("jelaskan soal itu"),
+        # sedangkan "apa itu X" / "X itu apa" adalah pertanyaan definisi yang mandiri
+        if tokens and tokens[-1] == "itu" and len(tokens) > 1 and tokens[-2] != "apa":
+            print("   -> Pertanyaan terdeteksi bergantung pada konteks (keyword: 'itu')")
+            return True
+
+        # Pertanyaan sangat pendek ("lalu?", "yang kedua?") hampir selalu merujuk ke giliran sebelumnya
+        if self._is_short_question(question):
+            print("   -> Pertanyaan terdeteksi bergantung pada konteks (pertanyaan sangat pendek)")
+            return True
         return False
+
+    @staticmethod
+    def _is_short_question(question: str) -> bool:
+        return len(re.findall(r"[0-9a-z]+", question.lower())) <= SHORT_QUESTION_MAX_WORDS
+
+    def _resolve_question(self, user_question: str, session_id: str) -> tuple:
+        """
+        (pertanyaan untuk cache & retrieval, masih_bergantung_konteks). Pertanyaan lanjutan
+        ditulis ulang menjadi pertanyaan mandiri dari riwayat sesi; jika gagal, pertanyaan
+        asli dipakai dan tetap diperlakukan bergantung konteks (tanpa cache).
+        """
+        if not self._is_context_dependent(user_question):
+            return user_question, False
+        turns, summary = self.sessions.context(session_id)
+        if not turns and not summary:
+            # Belum ada riwayat yang bisa dirujuk. Pertanyaan pendek tetap tidak masuk cache bersama:
+            # "lalu?" dari sesi lain bisa berarti apa saja.
+            return user_question, self._is_short_question(user_question)
+        rewritten = self.query_rewriter.rewrite(
+            user_question, turns[-CONDENSE_HISTORY_TURNS:], summary, self._generate_condensed
+        )
+        if rewritten is None:
+            return user_question, True
+        print(f"   -> Pertanyaan lanjutan ditulis ulang: '{rewritten}'")
+        return rewritten, False
+
+    def _generate_condensed(self, prompt: str) -> str:
+        candidates = self.router.candidates()
+        model = next((m for m in candidates if m.model_name == CONDENSE_MODEL), candidates[0])
+        return self._attempt_model(prompt, model)
     
     # --- TAHAP 1: INDEXING (FUNGSI UTAMA YANG DIMODIFIKASI) ---
     def setup_vector_db(self, folder_path: str):
         """
         Mengindeks semua file .txt dari folder secara cerdas.
         Hanya memproses file yang baru atau yang isinya berubah.
+
+        Aman dijalankan di background selagi chatbot melayani pertanyaan: chunk baru
+        disembunyikan dari query sampai sinkronisasi selesai, lalu snapshot lama
+        diganti dengan yang baru sekaligus.
         """
+        if not self._sync_lock.acquire(blocking=False):
+            print("⏳ Sinkronisasi index sedang berjalan, permintaan sync baru dilewati.")
+            return
+        try:
+            self._update_sync_status(
+                state="syncing", started_at=time.time(), finished_at=None, error=None,
+                files_total=0, files_done=0, chunks_total=0, chunks_embedded=0
+            )
+            ok = self._sync_vector_db(folder_path)
+            self._update_sync_status(state="ready" if ok else "error", finished_at=time.time())
+        except Exception as e:
+            print(f"❌ Sinkronisasi index gagal: {e}")
+            self._update_sync_status(state="error", error=str(e), finished_at=time.time())
+        finally:
+            self._sync_lock.release()
+
+    def start_background_sync(self, folder_path: str) -> threading.Thread:
+        """Menjalankan setup_vector_db di thread terpisah; query tetap dilayani dari snapshot terakhir."""
+        def run():
+            self.backfill_cache_embeddings()
+            self.setup_vector_db(folder_path)
+
+        thread = threading.Thread(target=run, name="index-sync", daemon=True)
+        thread.start()
+        return thread
+
+    def backfill_cache_embeddings(self):
+        """Entri cache lama (tanpa embedding) di-embed sekali supaya ikut lookup semantik."""
+        questions = self.qa_cache.missing_embeddings()
+        if not questions:
+            return
+        try:
+            self.qa_cache.set_embeddings(questions, self._embed_documents(questions, "RETRIEVAL_QUERY"))
+            print(f"✅ {len(questions)} entri cache lama dilengkapi embedding untuk lookup semantik.")
+        except Exception as e:
+            print(f"⚠️ Gagal melengkapi embedding cache lama (tetap dipakai sebagai cache persis): {e}")
+
+    def get_metrics(self) -> dict:
+        return {
+            "qa_cache": self.qa_cache.stats(),
+            "sessions": self.sessions.stats(),
+            "prompt": self.prompt_builder.stats(),
+            "streaming": {"ttft": self.ttft.snapshot(), "total": self.stream_duration.snapshot()},
+            "routing": self.router.stats(),
+            "hedging": {"enabled": HEDGE_ENABLED, **self.hedger.stats()},
+            "singleflight": self.singleflight.stats(),
+            "rate_limits": self.rate_limiter.stats(),
+            "query_embeddings": self.query_embeddings.stats(),
+            "micro_batching": {
+                "enabled": MICRO_BATCH_ENABLED,
+                "embed": self.embed_batcher.stats(),
+                "query": self.query_batcher.stats(),
+            },
+            "doc_routing": {"enabled": DOC_ROUTING_ENABLED, **self.documents.stats()},
+            "rerank": dict(self.rerank_stats),
+            "query_rewriter": self.query_rewriter.stats(),
+        }
+
+    def _update_sync_status(self, **changes):
+        # Ganti dict-nya (bukan diubah di tempat) agar pembaca di thread lain selalu melihat status utuh
+        self.sync_status = {**self.sync_status, **changes}
+
+    def is_ready(self) -> bool:
+        """Siap melayani jika sudah ada snapshot index yang konsisten."""
+        return self.sync_status["state"] == "ready" or (self.manifest.valid and bool(self.manifest.files))
+
+    def _reload_manifest(self):
+        self.manifest = IndexManifest(self.store.manifest_path, signature=self._index_signature())
+        self.manifest.load()
+        self.bm25 = BM25Index(self.bm25.path)
+
+    def _sync_vector_db(self, folder_path: str) -> bool:
         print(f"🔍 Memulai pemeriksaan dan indexing untuk folder: '{folder_path}'")
         if not os.path.isdir(folder_path):
             print(f"❌ Folder tidak ditemukan di '{folder_path}'")
-            return
+            return False
 
-        # 1. Dapatkan status file saat ini di folder
-        current_files = {}
-        for filename in os.listdir(folder_path):
-            if filename.endswith(".txt"):
-                file_path = os.path.join(folder_path, filename)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    current_files[filename] = hashlib.md5(content.encode()).hexdigest()
-
-        # 2. Dapatkan status file yang sudah ada di database
-        indexed_files = {}
-        if self.collection.count() > 0:
-            metadata = self.collection.get(include=["metadatas"])['metadatas']
-            for meta in metadata:
-                if 'source_file' in meta and 'file_hash' in meta:
-                    indexed_files[meta['source_file']] = meta['file_hash']
-        
-        # 3. Tentukan file yang perlu di-update, ditambah, atau dihapus
-        files_to_add = {f: h for f, h in current_files.items() if f not in indexed_files or indexed_files[f] != h}
-        files_to_remove = [f for f in indexed_files if f not in current_files]
+        start_time = time.perf_counter()
+        retired = set()  # chunk id dari snapshot lama yang dibuang setelah commit
+
+        # 0. Manifest tidak ada / kedaluwarsa: isi collection tidak bisa dipercaya, bangun ulang.
+        #    Embedding tetap diambil dari cache, jadi biayanya hanya penulisan ulang ke DB.
+        if not self.manifest.valid and self.store.count() > 0:
+            print("♻️ Manifest index tidak ditemukan, collection dibangun ulang dari awal.")
+            retired.update(self.store.get_ids())
+
+        # 1. Cek status file dengan stat (size, mtime) dulu; hanya file yang stat-nya
+        #    berubah yang dibaca dan di-hash
+        current_files = set()
+        files_to_add = {}  # filename -> (size, mtime_ns, file_hash, isi)
+        for entry in os.scandir(folder_path):
+            if not (entry.is_file() and entry.name.endswith(".txt")):
+                continue
+            filename = entry.name
+            current_files.add(filename)
+            stat = entry.stat()
+            if self.manifest.is_unchanged(filename, stat.st_size, stat.st_mtime_ns):
+                continue
+
+            with open(entry.path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            file_hash = hashlib.md5(content.encode()).hexdigest()
+            known = self.manifest.get(filename)
+            if known and known["hash"] == file_hash:
+                # Hanya mtime yang berubah (mis. file di-copy ulang), isinya sama
+                self.manifest.touch(filename, stat.st_size, stat.st_mtime_ns)
+            else:
+                files_to_add[filename] = (stat.st_size, stat.st_mtime_ns, file_hash, content)
+
+        # 2. File yang ada di manifest tapi sudah tidak ada di folder
+        files_to_remove = [f for f in self.manifest.files if f not in current_files]
+        files_done = 0
+        self._update_sync_status(files_total=len(files_to_add) + len(files_to_remove))
 
-        # 4. Proses penghapusan file lama dari DB
-        if files_to_remove:
-            for filename in files_to_remove:
-                print(f"🗑️ Menghapus file lama dari DB: '{filename}'")
-                self.collection.delete(where={"source_file": filename})
+        # 3. Tandai chunk file yang dihapus; baru benar-benar dihapus saat commit
+        for filename in files_to_remove:
+            print(f"🗑️ Menghapus file lama dari DB: '{filename}'")
+            retired.update(self.manifest.get(filename)["chunk_ids"])
+            self.manifest.remove(filename)
+            files_done += 1
+            self._update_sync_status(files_done=files_done)
 
-        # 5. Proses penambahan/pembaruan file di DB
+        # 4. Proses penambahan/pembaruan file di DB
         if files_to_add:
-            for filename, file_hash in files_to_add.items():
+            # Kumpulkan chunk dari semua file dulu supaya bisa di-embed dalam batch besar.
+            # Id chunk deterministik, jadi cukup bandingkan dengan id lama di manifest:
+            # hanya chunk baru yang di-embed & di-upsert, chunk yatim dihapus saat commit.
+            pending = []
+            total_chunks, reused_chunks = 0, 0
+            for filename, (size, mtime_ns, file_hash, source_text) in files_to_add.items():
                 print(f"➕ Mengindeks file baru atau yang diperbarui: '{filename}'")
-                
-                # Hapus entri lama jika ini adalah pembaruan
-                if filename in indexed_files:
-                    self.collection.delete(where={"source_file": filename})
-
-                file_path = os.path.join(folder_path, filename)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    source_text = f.read()
-
-                # Chunking
-                chunks = [source_text[i:i+2048] for i in range(0, len(source_text), 1848)]
-                
-                # Proses embedding dan penyimpanan per chunk
-                embeddings, metadatas, ids = [], [], []
-                for chunk in chunks:
-                    embeddings.append(self._get_embedding(chunk, "RETRIEVAL_DOCUMENT"))
-                    metadatas.append({'source_file': filename, 'file_hash': file_hash})
-                    ids.append(str(uuid.uuid4()))
-                
-                if embeddings:
-                    self.collection.add(embeddings=embeddings, documents=chunks, metadatas=metadatas, ids=ids)
-                    print(f"   -> {len(chunks)} chunk untuk '{filename}' berhasil diindeks.")
-        
+
+                # Chunking berbasis isi: bagian yang tidak diedit menghasilkan chunk yang identik
+                chunks = chunk_text(source_text)
+                ids = make_chunk_ids(filename, chunks)
+                known = self.manifest.get(filename)
+                old_ids = known["chunk_ids"] if known else []
+                old_id_set = set(old_ids)
+                new_positions = [i for i, chunk_id in enumerate(ids) if chunk_id not in old_id_set]
+                pending.append((filename, size, mtime_ns, file_hash, chunks, ids, old_ids, new_positions))
+
+                reused = len(chunks) - len(new_positions)
+                if known:
+                    print(f"   -> {reused}/{len(chunks)} chunk tidak berubah dari versi sebelumnya.")
+                total_chunks += len(chunks)
+                reused_chunks += reused
+
+            if total_chunks:
+                print(f"🔁 Rasio chunk reuse reindex ini: {reused_chunks}/{total_chunks} ({reused_chunks / total_chunks:.0%})")
+
+            new_chunks = [p[4][i] for p in pending for i in p[7]]
+            self._update_sync_status(chunks_total=len(new_chunks))
+            try:
+                new_embeddings = self._embed_documents(
+                    new_chunks, "RETRIEVAL_DOCUMENT",
+                    progress=lambda done: self._update_sync_status(chunks_embedded=done)
+                )
+            except Exception as e:
+                print(f"❌ Gagal membuat embedding, indexing dibatalkan: {e}")
+                self._reload_manifest()
+                return False
+
+            # Simpan ke DB per file. Chunk baru disembunyikan dulu dari query,
+            # chunk lama tetap terlihat sampai commit.
+            staged = []
+            live_ids = set()
+            try:
+                offset = 0
+                for filename, size, mtime_ns, file_hash, chunks, ids, old_ids, new_positions in pending:
+                    embeddings = new_embeddings[offset:offset + len(new_positions)]
+                    offset += len(new_positions)
+
+                    # Metadata menyimpan tetangga (prev/next) supaya urutan chunk bisa direkonstruksi
+                    metadatas = [
+                        {
+                            'source_file': filename,
+                            'chunk_id': chunk_id,
+                            'prev_id': ids[i - 1] if i > 0 else "",
+                            'next_id': ids[i + 1] if i + 1 < len(ids) else "",
+                        }
+                        for i, chunk_id in enumerate(ids)
+                    ]
+                    live_ids.update(ids)
+                    new_id_set = set(ids)
+                    retired.update(chunk_id for chunk_id in old_ids if chunk_id not in new_id_set)
+
+                    if new_positions:
+                        upsert_ids = [ids[i] for i in new_positions]
+                        self._hidden_ids = self._hidden_ids | set(upsert_ids)
+                        staged.extend(upsert_ids)
+                        self.store.upsert(
+                            ids=upsert_ids,
+                            embeddings=embeddings,
+                            documents=[chunks[i] for i in new_positions],
+                            metadatas=[metadatas[i] for i in new_positions],
+                        )
+                        for i in new_positions:
+                            self.bm25.add(ids[i], chunks[i])
+
+                    # Chunk lama yang tetangganya berubah cukup diperbarui metadatanya (tanpa embedding)
+                    old_neighbours = {
+                        chunk_id: (old_ids[i - 1] if i > 0 else "", old_ids[i + 1] if i + 1 < len(old_ids) else "")
+                        for i, chunk_id in enumerate(old_ids)
+                    }
+                    relinked = [
+                        i for i, chunk_id in enumerate(ids)
+                        if chunk_id in old_neighbours
+                        and old_neighbours[chunk_id] != (metadatas[i]['prev_id'], metadatas[i]['next_id'])
+                    ]
+                    if relinked:
+                        self.store.update_metadata([ids[i] for i in relinked], [metadatas[i] for i in relinked])
+
+                    removed = sum(1 for chunk_id in old_ids if chunk_id not in new_id_set)
+                    print(f"   -> '{filename}': {len(new_positions)} chunk baru, {len(relinked)} metadata diperbarui, "
+                          f"{removed} chunk yatim dihapus.")
+                    self.manifest.set(filename, size, mtime_ns, file_hash, ids)
+                    files_done += 1
+                    self._update_sync_status(files_done=files_done)
+            except Exception as e:
+                print(f"❌ Gagal menulis ke DB, perubahan dibatalkan: {e}")
+                if staged:
+                    self.store.delete(staged)
+                self._hidden_ids = frozenset()
+                self._reload_manifest()
+                return False
+
+            # Saat bangun ulang, id lama bisa sama dengan id baru; jangan sampai ikut terhapus
+            retired -= live_ids
+
+        # 5. Commit: index & manifest ditulis dulu, lalu snapshot diganti sekaligus (chunk baru
+        #    terlihat, chunk lama tersembunyi), baru chunk lama dihapus fisik dari index
+        if files_to_add or retired:
+            self.store.persist()
+            self.bm25.persist()
+        if self.manifest.dirty or not self.manifest.valid:
+            self.manifest.save()
+        self._hidden_ids = frozenset(retired)
+        if retired:
+            self.store.delete(list(retired))
+            for chunk_id in retired:
+                self.bm25.remove(chunk_id)
+            self.store.persist()
+            self.bm25.persist()
+        self._hidden_ids = frozenset()
+
+        # 6. Jawaban cache yang dibangun dari chunk yang berubah/dihapus tidak lagi valid
+        invalidated = self.qa_cache.invalidate_chunks(retired)
+        if invalidated:
+            print(f"🧹 {invalidated} jawaban cache dibuang karena sumbernya berubah.")
+
+        # 7. Vektor dokumen untuk routing; jika gagal, file yang belum punya vektor dicoba lagi di sync berikutnya
+        try:
+            self._update_document_index(set(files_to_add))
+        except Exception as e:
+            print(f"⚠️ Gagal memperbarui vektor dokumen: {e}")
+
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
         if not files_to_add and not files_to_remove:
-            print("✅ Database sudah sinkron. Tidak ada file yang perlu diupdate.")
+            print(f"✅ Database sudah sinkron. Tidak ada file yang perlu diupdate. ({elapsed_ms:.1f} ms)")
         else:
-            print("✅ Proses sinkronisasi database selesai.")
+            print(f"✅ Proses sinkronisasi database selesai. ({elapsed_ms:.1f} ms)")
+        return True
 
 
+    def _update_document_index(self, changed_files: set):
+        """
+        Perbarui vektor dokumen untuk file yang berubah, file yang belum punya vektor
+        (mis. index dokumen baru dibuat), dan buang file yang sudah tidak ada.
+        Embedding chunk diambil dari vector store, jadi tidak ada panggilan API.
+        """
+        # File tanpa chunk (kosong/hanya spasi) tidak punya vektor dokumen
+        indexed = [f for f in self.manifest.files if self.manifest.get(f).get("chunk_ids")]
+        for filename in self.documents.files():
+            if filename not in indexed:
+                self.documents.remove(filename)
+        stale = [f for f in indexed if f in changed_files or f not in self.documents]
+        for filename in stale:
+            rows = self.store.get(self.manifest.get(filename)["chunk_ids"], include_embeddings=True)
+            self.documents.set(filename, [row["embedding"] for row in rows])
+        if self.documents.dirty:
+            self.documents.persist()
+            print(f"🗂️ Vektor dokumen diperbarui untuk {len(stale)} file ({len(self.documents)} dokumen di index).")
+
     # --- TAHAP 2: RETRIEVAL & GENERATION ---
-    # (Fungsi get_response tidak perlu diubah, karena ia sudah mengambil dari collection yang ter-update)
+    def _retrieve(self, question: str, question_embedding: list) -> list:
+        """
+        Retrieval hibrida: kandidat dari vector store (dense) dan BM25 (leksikal,
+        menangkap identifier seperti "pasal 5" atau "inpres 4") digabung dengan
+        Reciprocal Rank Fusion. Jika routing dokumen aktif, kedua retriever hanya
+        mencari di dokumen hasil routing. Mengembalikan daftar chunk {id, document, metadata}.
+        """
+        hidden = self._hidden_ids
+        lexical = self.bm25.search(question, n_results=RETRIEVAL_CANDIDATES, exclude_ids=hidden)
+        routed = self._route_documents(question_embedding, lexical)
+        dense = self._dense_search(question_embedding, hidden, routed)
+        if routed is not None and any(chunk_source(chunk_id) not in routed for chunk_id, _ in lexical):
+            lexical = self.bm25.search(
+                question, n_results=RETRIEVAL_CANDIDATES, exclude_ids=hidden, source_files=routed
+            )
 
-    def get_response(self, user_question: str) -> str:
+        fused = reciprocal_rank_fusion(
+            [[r["id"] for r in dense], [chunk_id for chunk_id, _ in lexical]], k=RRF_K, with_scores=True
+        )[:RERANK_POOL_SIZE]
+        if not fused:
+            print("   -> Retrieval hibrida: tidak ada kandidat (index kosong?)")
+            return []
+        fused_scores = dict(fused)
+        candidates = [
+            {**r, "score": fused_scores[r["id"]]}
+            for r in self.store.get([chunk_id for chunk_id, _ in fused], include_embeddings=True)
+        ]
+        print(f"   -> Retrieval hibrida: {len(dense)} dense + {len(lexical)} BM25 -> {len(candidates)} kandidat")
+        return self._rerank(candidates)
+
+    def _route_documents(self, question_embedding: list, lexical: list):
+        """Set file sumber tempat chunk dicari, atau None untuk mencari di seluruh korpus."""
+        if not DOC_ROUTING_ENABLED:
+            return None
+        routed = self.documents.route(
+            question_embedding,
+            [chunk_source(chunk_id) for chunk_id, _ in lexical],
+            top_n=DOC_ROUTE_TOP_N,
+            min_documents=DOC_ROUTE_MIN_DOCUMENTS,
+            min_margin=DOC_ROUTE_MIN_MARGIN,
+            rrf_k=RRF_K,
+        )
+        if routed is None:
+            return None
+        print(f"   -> Routing dokumen: {', '.join(routed)}")
+        return set(routed)
+
+    def _rerank(self, candidates: list) -> list:
         """
-        Menjawab pertanyaan dengan alur hibrida: membedakan pertanyaan mandiri dan 
-        pertanyaan yang bergantung pada konteks untuk manajemen cache yang cerdas.
+        Gabungkan kandidat yang bersambung di file yang sama, lalu pilih span dengan MMR
+        supaya konteks tidak berisi potongan yang hampir sama. Total chunk terpilih tetap
+        paling banyak RETRIEVAL_TOP_K (span gabungan dihitung per anggotanya).
+        Setiap hasil: {id, ids, document, metadata}.
+        """
+        if not candidates:
+            return []
+        spans = merge_adjacent(candidates, max_chunks=RERANK_MAX_MERGED_CHUNKS)
+        selected = mmr_select(spans, RETRIEVAL_TOP_K, lambda_=MMR_LAMBDA)
+
+        # Token hemat bersih: konteks top-k versi lama (tanpa rerank) dikurangi konteks terpilih
+        baseline = sorted(candidates, key=lambda c: c["score"], reverse=True)[:RETRIEVAL_TOP_K]
+        baseline_tokens = sum(estimate_tokens(c["document"]) for c in baseline)
+        selected_tokens = sum(estimate_tokens(span["document"]) for span in selected)
+        saved = baseline_tokens - selected_tokens
+        with self._rerank_lock:
+            self.rerank_stats["requests"] += 1
+            self.rerank_stats["merged_spans"] += sum(1 for span in selected if len(span["ids"]) > 1)
+            self.rerank_stats["baseline_tokens"] += baseline_tokens
+            self.rerank_stats["selected_tokens"] += selected_tokens
+            self.rerank_stats["tokens_saved"] += saved
+        print(f"   -> Rerank: {len(candidates)} kandidat -> {len(spans)} span -> {len(selected)} terpilih (MMR), "
+              f"~{baseline_tokens} -> ~{selected_tokens} token konteks")
+        return [{key: span[key] for key in ("id", "ids", "document", "metadata")} for span in selected]
+
+
+    def _prepare_answer(self, user_question: str, session_id: str, is_dependent: bool = None, query: str = None) -> dict:
+        """
+        Langkah 1-2 dari alur jawaban: cek cache, retrieval, dan susun prompt.
+        `query` adalah pertanyaan (hasil tulis ulang) yang dipakai untuk cache, retrieval,
+        dan prompt; riwayat tetap mencatat `user_question` asli.
+        Mengembalikan {"answer": ...} jika jawaban sudah final (cache atau galat),
+        atau rencana generasi berisi "prompt" untuk diteruskan ke model.
         """
         print(f"\n🤖 Memproses pertanyaan baru: '{user_question}'")
+        start_time = time.perf_counter()
         
         # --- LANGKAH 1: DETEKSI SIFAT PERTANYAAN ---
-        is_dependent = self._is_context_dependent(user_question)
-        normalized_question = user_question.lower().strip()
+        if is_dependent is None:
+            query, is_dependent = self._resolve_question(user_question, session_id)
+        query = query or user_question
+        normalized_question = query.lower().strip()
 
         # --- JALUR A: PERTANYAAN MANDIRI (MENGGUNAKAN CACHE) ---
         if not is_dependent:
-            # Cek cache sederhana terlebih dahulu
-            if normalized_question in self.qa_cache:
+            # Cek cache persis terlebih dahulu (tidak butuh embedding)
+            cached_answer = self.qa_cache.get_exact(normalized_question)
+            if cached_answer is not None:
                 print(f"✅ Mengambil jawaban dari cache sederhana untuk: '{user_question}'")
-                cached_answer = self.qa_cache[normalized_question]
-                self.history.append((user_question, cached_answer))
-                self._save_to_json(self.history_path, self.history)
-                return cached_answer
-        
+                self._remember(session_id, user_question, cached_answer)
+                return {"answer": cached_answer}
+
+        try:
+            question_embedding = self.query_embeddings.get_or_compute(
+                query, lambda text: self._get_embedding(text, "RETRIEVAL_QUERY")
+            )
+        except Exception as e:
+            print(f"❌ Gagal membuat embedding pertanyaan: {e}")
+            return {"answer": "Maaf, terjadi masalah saat mencari informasi di dalam dokumen."}
+
+        if not is_dependent:
+            # Embedding pertanyaan memang dibutuhkan untuk retrieval, jadi lookup semantik tanpa biaya tambahan
+            hit = self.qa_cache.lookup(question_embedding, normalized_question)
+            if hit:
+                cached_answer, cached_question, score = hit
+                print(f"✅ Mengambil jawaban dari cache semantik ('{cached_question}', kemiripan {score:.3f})")
+                self._remember(session_id, user_question, cached_answer)
+                return {"answer": cached_answer}
+
         # --- LANGKAH 2: PROSES RAG (Retrieval & Generation) ---
         # Proses ini sama untuk kedua jalur, namun hasilnya akan diperlakukan berbeda.
         try:
-            print(f"✅ Collection name: {self.collection.name}")
-            print(f"📦 Document count: {self.collection.count()}")
+            print(f"✅ Vector store: {self.store.name}")
+            print(f"📦 Document count: {self.store.count()}")
             print(f"Berhasil retrieval dari Vector DB!")
 
-            question_embedding = self._get_embedding(user_question, "RETRIEVAL_QUERY")
-            results = self.collection.query(
-                query_embeddings=[question_embedding], n_results=3
-            )
-            retrieved_chunks = results['documents'][0]
+            retrieved = self._retrieve(query, question_embedding)
+            retrieved_chunks = [r["document"] for r in retrieved]
             # print(retrieved_chunks)
         except Exception as e:
             print(f"❌ Gagal saat retrieval dari Vector DB: {e}")
-            return "Maaf, terjadi masalah saat mencari informasi di dalam dokumen."
+            return {"answer": "Maaf, terjadi masalah saat mencari informasi di dalam dokumen."}
 
         if not retrieved_chunks:
-            return "Maaf, informasi yang relevan tidak ditemukan di dalam dokumen."
-
-        retrieved_context = "\n\n---\n\n".join(retrieved_chunks)
-        history_str = "\n".join([f"Pengguna: {q}\nAsisten: {a}" for q, a in self.history])
-        if not history_str:
-            history_str = "Tidak ada riwayat percakapan sebelumnya."
+            return {"answer": "Maaf, informasi yang relevan tidak ditemukan di dalam dokumen."}
 
-        synthesis_prompt = PROMPT_TEMPLATES["synthesizer"].format(
-            conversation_history=history_str,
-            combined_info=retrieved_context,
-            user_question=user_question
+        turns, summary = self.sessions.context(session_id)
+        synthesis_prompt, prompt_info = self.prompt_builder.build(query, retrieved_chunks, turns, summary)
+        print(
+            f"🧮 Prompt ~{prompt_info['total_tokens']}/{prompt_info['budget']} token "
+            f"(konteks {prompt_info['context_tokens']} dari {prompt_info['chunks_used']}/{prompt_info['chunks_total']} chunk, "
+            f"riwayat {prompt_info['history_tokens']} dari {prompt_info['turns_used']}/{prompt_info['turns_total']} giliran, "
+            f"ringkasan {prompt_info['summary_tokens']})"
         )
 
-        print("   L Menghasilkan jawaban akhir dengan mekanisme fallback...")
-        self.current_model_index = 0
-        final_answer = self._call_model_with_fallback(synthesis_prompt)
+        return {
+            "prompt": synthesis_prompt,
+            "prompt_info": prompt_info,
+            "is_dependent": is_dependent,
+            "normalized_question": normalized_question,
+            "question_embedding": question_embedding,
+            "retrieved": retrieved,
+            "start_time": start_time,
+        }
+
+    def _store_answer(self, plan: dict, user_question: str, session_id: str, final_answer: str):
+        """Langkah 3: simpan jawaban hasil generasi ke riwayat sesi dan (jika mandiri) ke cache."""
+        is_dependent = plan["is_dependent"]
+        if not is_dependent:
+            self.qa_cache.record_miss_latency(time.perf_counter() - plan["start_time"])
         
         # --- LANGKAH 3: MANAJEMEN PENYIMPANAN CERDAS ---
-        INVALID_ANSWER_PREFIXES = ("Maaf,", "❌")
-        is_valid_answer = not any(final_answer.strip().startswith(p) for p in INVALID_ANSWER_PREFIXES)
-
         # Selalu simpan ke riwayat percakapan jika jawaban valid
-        if is_valid_answer:
-            self.history.append((user_question, final_answer))
-            if len(self.history) > 10: self.history.pop(0)
-            self._save_to_json(self.history_path, self.history)
+        if self._is_valid_answer(final_answer):
+            # Giliran yang tidak lagi muat di prompt apa adanya ikut dilipat ke ringkasan
+            self._remember(session_id, user_question, final_answer,
+                           keep=min(plan["prompt_info"]["turns_used"] + 1, SESSION_RECENT_TURNS))
 
             # HANYA simpan ke cache jika pertanyaan adalah mandiri (standalone)
             if not is_dependent:
                 print("   L Jawaban valid & mandiri. Menyimpan ke cache...")
-                self.qa_cache[normalized_question] = final_answer
-                self._save_to_json(self.cache_path, self.qa_cache)
+                self.qa_cache.put(plan["normalized_question"], final_answer, plan["question_embedding"],
+                                  sources=[chunk_id for r in plan["retrieved"] for chunk_id in r["ids"]])
             else:
                 print("   L Jawaban valid & bergantung konteks. TIDAK disimpan ke cache.")
         else:
             print(f"   L Jawaban tidak valid ('{final_answer}'). Tidak disimpan ke mana pun.")
 
+    @staticmethod
+    def _is_valid_answer(answer: str) -> bool:
+        return not any(answer.strip().startswith(p) for p in INVALID_ANSWER_PREFIXES)
+
+    def _await_flight(self, future, user_question: str, session_id: str):
+        """Tunggu jawaban leader single-flight; None jika leader gagal (pemanggil menghitung sendiri)."""
+        print(f"🔗 Pertanyaan identik sedang diproses, menunggu jawaban yang sama: '{user_question}'")
+        try:
+            answer = future.result()
+        except Exception:
+            return None
+        if self._is_valid_answer(answer):
+            self._remember(session_id, user_question, answer)
+        return answer
+
+    def get_response(self, user_question: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+        """
+        Menjawab pertanyaan dengan alur hibrida: membedakan pertanyaan mandiri dan 
+        pertanyaan yang bergantung pada konteks untuk manajemen cache yang cerdas.
+        Riwayat yang dipakai di prompt hanya riwayat milik `session_id`.
+        Pertanyaan mandiri identik yang datang bersamaan hanya diproses sekali (single-flight).
+        """
+        query, is_dependent = self._resolve_question(user_question, session_id)
+        if is_dependent:
+            return self._generate_response(user_question, session_id, is_dependent, query)
+
+        flight_key = query.lower().strip()
+        future, leader = self.singleflight.begin(flight_key)
+        if not leader:
+            answer = self._await_flight(future, user_question, session_id)
+            if answer is not None:
+                return answer
+            return self._generate_response(user_question, session_id, is_dependent, query)
+        try:
+            answer = self._generate_response(user_question, session_id, is_dependent, query)
+        except BaseException as e:
+            self.singleflight.finish(flight_key, future, error=e)
+            raise
+        self.singleflight.finish(flight_key, future, answer)
+        return answer
+
+    def _generate_response(self, user_question: str, session_id: str, is_dependent: bool, query: str) -> str:
+        plan = self._prepare_answer(user_question, session_id, is_dependent, query)
+        if "answer" in plan:
+            return plan["answer"]
+
+        print("   L Menghasilkan jawaban akhir dengan mekanisme fallback...")
+        final_answer = self._call_model_with_fallback(plan["prompt"])
+        self._store_answer(plan, user_question, session_id, final_answer)
         return final_answer
 
+    def stream_response(self, user_question: str, session_id: str = DEFAULT_SESSION_ID):
+        """
+        Seperti get_response, tetapi berupa generator yang menghasilkan potongan
+        jawaban begitu diterima dari Gemini (stream=True). Jawaban lengkap disimpan
+        ke riwayat & cache setelah stream selesai; stream yang terputus tidak disimpan.
+        Duplikat dari pertanyaan mandiri yang sedang diproses get_response menerima
+        jawaban utuh leader tersebut.
+
+        Stream tidak pernah menjadi leader single-flight: setiap potongannya diambil
+        di thread executor yang berbeda, jadi duplikat yang menunggu di thread executor
+        bisa menghabiskan pool dan membuat leader stream tidak pernah lanjut (deadlock).
+        Leader get_response memegang thread-nya sendiri sampai selesai, jadi aman ditunggu.
+        """
+        start_time = time.perf_counter()
+        query, is_dependent = self._resolve_question(user_question, session_id)
+        if not is_dependent:
+            future = self.singleflight.join(query.lower().strip())
+            if future is not None:
+                answer = self._await_flight(future, user_question, session_id)
+                if answer is not None:
+                    self.ttft.record(time.perf_counter() - start_time)
+                    yield answer
+                    return
+
+        try:
+            yield from self._stream_answer(user_question, session_id, is_dependent, query, start_time)
+        except Exception as e:
+            print(f"❌ Streaming jawaban terputus: {e}")
+            yield "\n\n❌ Jawaban terputus, silakan coba lagi."
+
+    def _stream_answer(self, user_question: str, session_id: str, is_dependent: bool, query: str, start_time: float):
+        plan = self._prepare_answer(user_question, session_id, is_dependent, query)
+        if "answer" in plan:
+            self.ttft.record(time.perf_counter() - start_time)
+            yield plan["answer"]
+            return
+
+        print("   L Streaming jawaban akhir dengan mekanisme fallback...")
+        pieces = []
+        for piece in self._stream_model_with_fallback(plan["prompt"]):
+            if not pieces:
+                ttft = time.perf_counter() - start_time
+                self.ttft.record(ttft)
+                print(f"⚡ Token pertama setelah {ttft * 1000:.0f} ms")
+            pieces.append(piece)
+            yield piece
+        self.stream_duration.record(time.perf_counter() - start_time)
+        self._store_answer(plan, user_question, session_id, "".join(pieces))
+
 
 # Akses API_KEY menggunakan os.getenv()
 API_KEY = os.getenv("API_KEY")
@@ -355,7 +1244,11 @@ def init_model():
     return my_generation_config, my_safety_settings
 
 
-def init_chatbot():
+def init_chatbot(sync_index: bool = True):
+    """
+    Membuat chatbot. Dengan sync_index=False index tidak disinkronkan di sini;
+    pemanggil (mis. server API) bisa menjalankan start_background_sync sendiri.
+    """
     my_generation_config, my_safety_settings = init_model()
     if not my_generation_config:
         return None
@@ -366,9 +1259,9 @@ def init_chatbot():
         safety_settings=my_safety_settings
     )
     
-    # Tentukan folder yang berisi dokumen sumber Anda
-    source_folder_path = "bahan-chatbot/txt/"
-    chatbot.setup_vector_db(source_folder_path)
+    if sync_index:
+        chatbot.backfill_cache_embeddings()
+        chatbot.setup_vector_db(SOURCE_FOLDER_PATH)
 
     return chatbot
 
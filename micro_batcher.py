@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from latency import LatencyWindow
+
+
+class MicroBatcher:
+    """
+    Mengumpulkan permintaan dari banyak thread yang datang dalam jendela waktu pendek
+    (`max_wait` detik) lalu memprosesnya dalam satu panggilan batch, mis. satu
+    embed_content untuk banyak pertanyaan atau satu query vector store untuk banyak
+    embedding. Hasil dikembalikan ke masing-masing pemanggil yang menunggu.
+
+    `process(key, items)` harus mengembalikan daftar hasil dengan urutan yang sama
+    seperti `items`. Item dengan `key` berbeda (mis. task_type embedding berbeda) tidak
+    digabung dalam satu panggilan. Paling banyak `workers` batch diproses bersamaan;
+    jika semuanya sibuk, permintaan baru menumpuk di antrian dan ikut batch berikutnya.
+    """
+
+    def __init__(self, process, max_batch_size: int = 32, max_wait: float = 0.005, workers: int = 1,
+                 name: str = "micro-batcher"):
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.stats_counters = {"items": 0, "batches": 0, "max_batch_size": 0, "errors": 0}
+        self.queue_wait = LatencyWindow(max_samples=1000)
+        self._in_flight = 0   # pemanggil submit() yang belum mendapat hasil
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item, key=None):
+        """Masukkan item ke batch berikutnya dan tunggu hasilnya (galat batch diteruskan ke pemanggil)."""
+        future = Future()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            self._queue.put((key, item, future, time.perf_counter()))
+            return future.result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _collect(self) -> list:
+        pending = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(pending) < self.max_batch_size:
+            # Tidak ada pemanggil lain yang sedang berjalan: menunggu hanya menambah latensi
+            with self._lock:
+                alone = self._in_flight <= len(pending)
+            if alone and self._queue.empty():
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return pending
+
+    def _run(self):
+        while True:
+            self._slots.acquire()
+            pending = self._collect()
+            self._executor.submit(self._process_batch, pending)
+
+    def _process_batch(self, pending: list):
+        try:
+            groups = {}
+            for entry in pending:
+                groups.setdefault(entry[0], []).append(entry)
+            for key, entries in groups.items():
+                self._process_group(key, entries)
+        finally:
+            self._slots.release()
+
+    def _process_group(self, key, entries: list):
+        started = time.perf_counter()
+        for _, _, _, submitted in entries:
+            self.queue_wait.record(started - submitted)
+        try:
+            results = self.process(key, [item for _, item, _, _ in entries])
+            if len(results) != len(entries):
+                raise RuntimeError(f"{self.name}: {len(results)} hasil untuk {len(entries)} item")
+        except Exception as e:
+            with self._lock:
+                self.stats_counters["errors"] += 1
+            for _, _, future, _ in entries:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.stats_counters["items"] += len(entries)
+            self.stats_counters["batches"] += 1
+            self.stats_counters["max_batch_size"] = max(self.stats_counters["max_batch_size"], len(entries))
+        for (_, _, future, _), result in zip(entries, results):
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+        return {
+            **counters,
+            "avg_batch_size": counters["items"] / counters["batches"] if counters["batches"] else 0.0,
+            "queue_wait": self.queue_wait.snapshot(),
+            "queued": self._queue.qsize(),
+        }
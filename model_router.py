@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import deque
+
+from latency import LatencyWindow
+
+CLOSED = "closed"   # sehat, menerima trafik
+OPEN = "open"       # sedang cooldown, dilewati router
+
+
+class ModelHealth:
+    """Catatan kesehatan satu model: hasil terakhir, latensi, dan status circuit breaker."""
+
+    def __init__(self, name: str, window: int):
+        self.name = name
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window)  # True = sukses, False = gagal
+        self.consecutive_failures = 0
+        self.cooldown = 0.0
+        self.open_until = 0.0
+        self.latency = LatencyWindow(max_samples=200)
+        self.counters = {"routed": 0, "successes": 0, "failures": 0, "rate_limited": 0,
+                         "short_circuited": 0, "opened": 0, "probes": 0}
+        self.last_error = None
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class ModelRouter:
+    """
+    Router model dengan circuit breaker per model, pengganti fallback berurutan.
+
+    - Model yang gagal `failure_threshold` kali berturut-turut, atau error rate-nya
+      di jendela terakhir melewati `error_rate_threshold`, dibuka (OPEN) selama
+      cooldown yang berlipat setiap kali dibuka lagi (maks `max_cooldown`).
+    - Sinyal 429/kuota langsung membuka circuit dengan `rate_limit_cooldown`.
+    - Request hanya dikirim ke model CLOSED sesuai urutan prioritas, jadi model yang
+      sedang dibatasi tidak lagi membebani setiap request dengan latensi gagalnya.
+    - Thread background mem-probe model OPEN yang cooldown-nya habis dan menutup
+      kembali circuit jika probe berhasil.
+    """
+
+    def __init__(self, models: list, probe=None, rate_limit_errors: tuple = (), failure_threshold: int = 3,
+                 error_rate_threshold: float = 0.5, window: int = 20, min_samples: int = 5,
+                 base_cooldown: float = 30.0, max_cooldown: float = 600.0, rate_limit_cooldown: float = 60.0,
+                 probe_interval: float = 15.0):
+        self.models = list(models)
+        self.probe = probe
+        self.rate_limit_errors = rate_limit_errors
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_samples = min_samples
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.rate_limit_cooldown = rate_limit_cooldown
+        self.probe_interval = probe_interval
+        self.health = {model.model_name: ModelHealth(model.model_name, window) for model in self.models}
+        self.last_resort_routes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._prober = None
+
+    # --- Klasifikasi galat ---
+    def is_rate_limit(self, error: Exception) -> bool:
+        if self.rate_limit_errors and isinstance(error, self.rate_limit_errors):
+            return True
+        message = str(error).lower()
+        return "429" in message or "quota" in message or "rate limit" in message
+
+    # --- Routing ---
+    def candidates(self) -> list:
+        """
+        Model yang boleh dicoba untuk satu request, sesuai urutan prioritas. Jika semua
+        circuit terbuka, model dengan cooldown paling cepat habis tetap dicoba sebagai
+        upaya terakhir daripada langsung menolak request.
+        """
+        now = time.time()
+        with self._lock:
+            healthy = []
+            for model in self.models:
+                health = self.health[model.model_name]
+                if health.state == CLOSED:
+                    healthy.append(model)
+                else:
+                    health.counters["short_circuited"] += 1
+            if healthy:
+                return healthy
+            self.last_resort_routes += 1
+            return sorted(self.models, key=lambda m: max(self.health[m.model_name].open_until - now, 0))
+
+    def latency_window(self, model) -> LatencyWindow:
+        return self.health[model.model_name].latency
+
+    def record_success(self, model, latency: float):
+        with self._lock:
+            health = self.health[model.model_name]
+            health.counters["routed"] += 1
+            health.counters["successes"] += 1
+            health.outcomes.append(True)
+            health.consecutive_failures = 0
+            health.latency.record(latency)
+            if health.state == OPEN:  # upaya terakhir berhasil: model pulih
+                self._close(health)
+
+    def record_failure(self, model, error: Exception):
+        rate_limited = self.is_rate_limit(error)
+        with self._lock:
+            health = self.health[model.model_name]
+            health.counters["routed"] += 1
+            health.counters["failures"] += 1
+            health.outcomes.append(False)
+            health.consecutive_failures += 1
+            health.last_error = f"{type(error).__name__}: {error}"[:200]
+            if rate_limited:
+                health.counters["rate_limited"] += 1
+                self._open(health, self.rate_limit_cooldown, reason="rate limit/kuota")
+            elif health.consecutive_failures >= self.failure_threshold:
+                self._open(health, reason=f"{health.consecutive_failures} kali gagal berturut-turut")
+            elif len(health.outcomes) >= self.min_samples and health.error_rate >= self.error_rate_threshold:
+                self._open(health, reason=f"error rate {health.error_rate:.0%}")
+
+    def _open(self, health: ModelHealth, cooldown: float = None, reason: str = ""):
+        if cooldown is None:
+            cooldown = min(max(health.cooldown * 2, self.base_cooldown), self.max_cooldown)
+        health.cooldown = cooldown
+        health.open_until = time.time() + cooldown
+        if health.state != OPEN:
+            health.state = OPEN
+            health.counters["opened"] += 1
+            print(f"⛔ Circuit model '{health.name}' dibuka selama {cooldown:.0f} detik ({reason}).")
+
+    def _close(self, health: ModelHealth):
+        health.state = CLOSED
+        health.cooldown = 0.0
+        health.consecutive_failures = 0
+        health.outcomes.clear()
+        print(f"✅ Circuit model '{health.name}' ditutup kembali, model menerima trafik.")
+
+    # --- Probe background ---
+    def start(self):
+        if self.probe is None or self._prober is not None:
+            return
+        self._prober = threading.Thread(target=self._probe_loop, name="model-router-probe", daemon=True)
+        self._prober.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            now = time.time()
+            with self._lock:
+                due = [m for m in self.models
+                       if self.health[m.model_name].state == OPEN and self.health[m.model_name].open_until <= now]
+            for model in due:
+                self._probe_model(model)
+
+    def _probe_model(self, model):
+        start = time.perf_counter()
+        try:
+            self.probe(model)
+        except Exception as e:
+            with self._lock:
+                health = self.health[model.model_name]
+                health.counters["probes"] += 1
+                health.last_error = f"{type(e).__name__}: {e}"[:200]
+                self._open(health, self.rate_limit_cooldown if self.is_rate_limit(e) else None, reason="probe gagal")
+            return
+        with self._lock:
+            health = self.health[model.model_name]
+            health.counters["probes"] += 1
+            health.latency.record(time.perf_counter() - start)
+            if health.state == OPEN:
+                self._close(health)
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            models = {
+                name: {
+                    "state": health.state,
+                    **health.counters,
+                    "error_rate": health.error_rate,
+                    "cooldown_remaining_s": max(health.open_until - now, 0.0) if health.state == OPEN else 0.0,
+                    "latency": health.latency.snapshot(),
+                    "last_error": health.last_error,
+                }
+                for name, health in self.health.items()
+            }
+            return {"models": models, "last_resort_routes": self.last_resort_routes}
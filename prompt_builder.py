@@ -0,0 +1,112 @@
+import threading
+
+# Perkiraan kasar tokenizer Gemini untuk teks Bahasa Indonesia. Menghitung token
+# persis (model.count_tokens) adalah panggilan jaringan, terlalu mahal per request.
+CHARS_PER_TOKEN = 4
+
+NO_HISTORY = "Tidak ada riwayat percakapan sebelumnya."
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    return text[:max(max_tokens, 0) * CHARS_PER_TOKEN]
+
+
+class PromptBuilder:
+    """
+    Menyusun prompt synthesizer dengan anggaran token yang eksplisit.
+
+    Urutan prioritas: kerangka template + pertanyaan, lalu konteks hasil retrieval
+    (sesuai peringkat), lalu giliran percakapan terbaru, dan terakhir ringkasan
+    giliran-giliran lama. Bagian yang tidak muat dibuang (atau dipotong untuk
+    chunk pertama dan ringkasan), sehingga ukuran prompt tidak ikut membesar
+    seiring panjangnya percakapan.
+    """
+
+    def __init__(self, template: str, max_tokens: int = 4000, chunk_separator: str = "\n\n---\n\n"):
+        self.template = template
+        self.max_tokens = max_tokens
+        self.chunk_separator = chunk_separator
+        self._lock = threading.Lock()
+        self.stats_counters = {"prompts": 0, "total_tokens": 0, "max_tokens_seen": 0, "chunks_dropped": 0, "turns_dropped": 0}
+
+    @staticmethod
+    def _format_turn(question: str, answer: str) -> str:
+        return f"Pengguna: {question}\nAsisten: {answer}"
+
+    def build(self, question: str, chunks: list, turns: list, summary: str = "") -> tuple:
+        """
+        Mengembalikan (prompt, info). `turns` urut dari yang terlama; info memuat
+        rincian token per bagian dan jumlah chunk/giliran yang masuk.
+        """
+        base_tokens = estimate_tokens(self.template.format(
+            conversation_history=NO_HISTORY, combined_info="", user_question=question
+        ))
+        remaining = self.max_tokens - base_tokens
+
+        # 1. Konteks retrieval sesuai peringkat
+        context_parts = []
+        for chunk in chunks:
+            cost = estimate_tokens(chunk) + (estimate_tokens(self.chunk_separator) if context_parts else 0)
+            if cost > remaining:
+                if not context_parts:  # selalu sertakan potongan chunk terbaik
+                    chunk = _truncate(chunk, remaining)
+                    context_parts.append(chunk)
+                    remaining -= estimate_tokens(chunk)
+                break
+            context_parts.append(chunk)
+            remaining -= cost
+        combined_info = self.chunk_separator.join(context_parts)
+
+        # 2. Giliran terbaru, dari yang paling baru ke belakang
+        history_parts = []
+        for q, a in reversed(turns):
+            cost = estimate_tokens(self._format_turn(q, a)) + 1
+            if cost > remaining:
+                break
+            history_parts.insert(0, self._format_turn(q, a))
+            remaining -= cost
+
+        # 3. Ringkasan giliran lama, dipotong jika perlu
+        summary_text = ""
+        if summary and remaining > 0:
+            summary_text = _truncate(f"Ringkasan percakapan sebelumnya: {summary}", remaining)
+            remaining -= estimate_tokens(summary_text) + 1
+
+        history_str = "\n".join(([summary_text] if summary_text else []) + history_parts)
+        if not history_str:
+            history_str = NO_HISTORY
+
+        prompt = self.template.format(
+            conversation_history=history_str, combined_info=combined_info, user_question=question
+        )
+        info = {
+            "total_tokens": estimate_tokens(prompt),
+            "budget": self.max_tokens,
+            "context_tokens": estimate_tokens(combined_info),
+            "history_tokens": sum(estimate_tokens(part) for part in history_parts),
+            "summary_tokens": estimate_tokens(summary_text),
+            "chunks_used": len(context_parts),
+            "chunks_total": len(chunks),
+            "turns_used": len(history_parts),
+            "turns_total": len(turns),
+        }
+        with self._lock:
+            self.stats_counters["prompts"] += 1
+            self.stats_counters["total_tokens"] += info["total_tokens"]
+            self.stats_counters["max_tokens_seen"] = max(self.stats_counters["max_tokens_seen"], info["total_tokens"])
+            self.stats_counters["chunks_dropped"] += len(chunks) - len(context_parts)
+            self.stats_counters["turns_dropped"] += len(turns) - len(history_parts)
+        return prompt, info
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+        return {
+            **counters,
+            "budget": self.max_tokens,
+            "avg_tokens": counters["total_tokens"] / counters["prompts"] if counters["prompts"] else 0.0,
+        }
@@ -0,0 +1,117 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from batch_writer import BatchWriter
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text.lower()).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU di memori: teks pertanyaan yang dinormalisasi -> embedding query.
+    Pertanyaan lanjutan dan pertanyaan yang diulang tidak perlu round trip ke API
+    embedding lagi. Jika `persistent` (EmbeddingCache dengan tabel sendiri) diberikan,
+    embedding juga disimpan ke SQLite sehingga tetap terpakai setelah restart.
+
+    Penulisan ke disk (embedding baru, waktu pakai hit dari disk) dikirim ke antrian
+    dan dijalankan thread writer per batch, jadi request tidak menunggu commit SQLite.
+    """
+
+    def __init__(self, model: str, task_type: str = "RETRIEVAL_QUERY", max_entries: int = 2000, persistent=None,
+                 batch_interval: float = 0.5, max_batch: int = 256):
+        self.model = model
+        self.task_type = task_type
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats_counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "write_errors": 0}
+        self._miss_latency_total = 0.0
+        self._writer = None
+        if persistent is not None:
+            self._writer = BatchWriter(self._apply, name="query-embedding-writer",
+                                       batch_interval=batch_interval, max_batch=max_batch)
+
+    # --- Thread writer ---
+    def _apply(self, items: list):
+        """Embedding baru (key, embedding) dan hit dari disk (key, None) dalam satu batch."""
+        puts, touched = {}, set()
+        for key, embedding in items:
+            if embedding is None:
+                touched.add(key)
+            else:
+                puts[key] = embedding
+        try:
+            if puts:
+                self.persistent.put_many(list(puts), list(puts.values()), self.model, self.task_type)
+            if touched - puts.keys():
+                self.persistent.touch_many(list(touched - puts.keys()), self.model, self.task_type)
+        except Exception as e:
+            with self._lock:
+                self.stats_counters["write_errors"] += 1
+            print(f"❌ Gagal menyimpan {len(puts) + len(touched)} embedding pertanyaan ke disk: {e}")
+
+    def flush(self, timeout: float = 5.0):
+        """Tunggu sampai semua penulisan yang sudah diantrikan masuk ke disk."""
+        if self._writer is not None:
+            self._writer.flush(timeout)
+
+    def _remember(self, key: str, embedding):
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, text: str, compute) -> list:
+        """Embedding untuk `text` dari cache, atau hasil `compute(text)` yang lalu di-cache."""
+        key = normalize_query(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.stats_counters["memory_hits"] += 1
+                return embedding
+
+        if self.persistent is not None:
+            embedding = self.persistent.get_many([key], self.model, self.task_type, touch=False).get(0)
+            if embedding is not None:
+                self._remember(key, embedding)
+                self._writer.submit((key, None))
+                with self._lock:
+                    self.stats_counters["disk_hits"] += 1
+                return embedding
+
+        start = time.perf_counter()
+        embedding = compute(text)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats_counters["misses"] += 1
+            self._miss_latency_total += elapsed
+        self._remember(key, embedding)
+        if self.persistent is not None:
+            self._writer.submit((key, embedding))
+        return embedding
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+            size = len(self._entries)
+            miss_total = self._miss_latency_total
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        avg_miss_ms = miss_total / counters["misses"] * 1000 if counters["misses"] else 0.0
+        return {
+            **counters,
+            "size": size,
+            "pending_writes": self._writer.pending() if self._writer is not None else 0,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "avg_miss_latency_ms": avg_miss_ms,
+            "estimated_saved_ms": hits * avg_miss_ms,
+        }
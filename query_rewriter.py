@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+MAX_REWRITE_CHARS = 500
+
+
+class QueryRewriter:
+    """
+    Menulis ulang pertanyaan lanjutan ("syaratnya apa?") menjadi pertanyaan mandiri
+    ("apa syarat penerima PBI JK?") berdasarkan riwayat sesi, supaya bisa memakai
+    cache jawaban dan retrieval biasa. Hasilnya di-memo (LRU) per kombinasi
+    riwayat + pertanyaan, jadi pertanyaan lanjutan yang sama tidak memanggil model lagi.
+    """
+
+    def __init__(self, template: str, max_entries: int = 1000):
+        self.template = template
+        self.max_entries = max_entries
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats_counters = {"rewrites": 0, "memo_hits": 0, "failures": 0}
+
+    @staticmethod
+    def _key(question: str, turns: list, summary: str) -> str:
+        payload = json.dumps([question.lower().strip(), turns, summary], ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _clean(text: str):
+        lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+        if not lines:
+            return None
+        rewritten = lines[0].strip("\"'` ")
+        if not rewritten or len(rewritten) > MAX_REWRITE_CHARS or rewritten.startswith(("❌", "Maaf,")):
+            return None
+        return rewritten
+
+    def rewrite(self, question: str, turns: list, summary: str, generate):
+        """
+        Pertanyaan mandiri hasil `generate(prompt)`, atau None jika gagal (pemanggil
+        memperlakukan pertanyaan sebagai bergantung konteks seperti sebelumnya).
+        """
+        key = self._key(question, turns, summary)
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.stats_counters["memo_hits"] += 1
+                return self._memo[key]
+
+        conversation = "\n".join(f"Pengguna: {q}\nAsisten: {a}" for q, a in turns)
+        prompt = self.template.format(
+            summary=summary or "(tidak ada)", conversation=conversation or "(tidak ada)", question=question
+        )
+        try:
+            rewritten = self._clean(generate(prompt))
+        except Exception as e:
+            print(f"⚠️ Gagal menulis ulang pertanyaan lanjutan: {e}")
+            rewritten = None
+
+        with self._lock:
+            if rewritten is None:
+                self.stats_counters["failures"] += 1
+                return None
+            self.stats_counters["rewrites"] += 1
+            self._memo[key] = rewritten
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return rewritten
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+            size = len(self._memo)
+        lookups = counters["rewrites"] + counters["memo_hits"] + counters["failures"]
+        return {**counters, "size": size, "memo_hit_rate": counters["memo_hits"] / lookups if lookups else 0.0}
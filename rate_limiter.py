@@ -0,0 +1,109 @@
+import heapq
+import itertools
+import threading
+import time
+
+from latency import LatencyWindow
+
+# Prioritas antrian: angka kecil dilayani lebih dulu
+INTERACTIVE = 0   # request pengguna (/chat, embedding pertanyaan)
+BACKGROUND = 1    # indexing, backfill, ringkasan sesi, probe model
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class TokenBucket:
+    """
+    Token bucket untuk satu kuota (mis. satu model pada satu jenis endpoint) dengan
+    antrian berprioritas: pemanggil menunggu gilirannya alih-alih langsung gagal,
+    dan pemanggil interaktif selalu didahulukan dari pemanggil background.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters = []          # heap (prioritas, urutan)
+        self._seq = itertools.count()
+        self.granted = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_times = {p: LatencyWindow(max_samples=500) for p in PRIORITY_NAMES}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority: int = INTERACTIVE, cost: float = 1.0) -> float:
+        """Tunggu sampai giliran dan token cukup; mengembalikan lama menunggu (detik)."""
+        cost = min(cost, self.capacity)
+        start = time.monotonic()
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == entry and self._tokens >= cost:
+                        break
+                    # Kepala antrian menunggu token terisi; yang lain menunggu dibangunkan
+                    timeout = (cost - self._tokens) / self.rate if self._waiters[0] == entry else None
+                    self._cond.wait(timeout)
+                self._tokens -= cost
+                self.granted[priority] += 1
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+        waited = time.monotonic() - start
+        self.wait_times[priority].record(waited)
+        return waited
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._refill()
+            depth = {name: sum(1 for p, _ in self._waiters if p == priority) for priority, name in PRIORITY_NAMES.items()}
+            tokens = self._tokens
+        return {
+            "rate_per_minute": self.rate * 60,
+            "burst": self.capacity,
+            "tokens_available": round(tokens, 2),
+            "queue_depth": depth,
+            "granted": {PRIORITY_NAMES[p]: n for p, n in self.granted.items()},
+            "wait": {PRIORITY_NAMES[p]: window.snapshot() for p, window in self.wait_times.items()},
+        }
+
+
+class RateLimiter:
+    """
+    Kumpulan token bucket per (jenis endpoint, model), mis. ("generate", "models/gemini-2.5-flash")
+    atau ("embed", "models/text-embedding-004"). Batas diambil dari `limits`
+    {model: (rpm, burst)}, selain itu dari `default_limits` {jenis_endpoint: (rpm, burst)}.
+    """
+
+    def __init__(self, limits: dict = None, default_limits: dict = None):
+        self.limits = limits or {}
+        self.default_limits = default_limits or {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, endpoint: str, model: str) -> TokenBucket:
+        key = (endpoint, model)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rpm, burst = self.limits.get(model) or self.default_limits[endpoint]
+                bucket = self._buckets[key] = TokenBucket(rpm, burst)
+            return bucket
+
+    def acquire(self, endpoint: str, model: str, priority: int = INTERACTIVE, cost: float = 1.0) -> float:
+        waited = self._bucket(endpoint, model).acquire(priority, cost)
+        if waited > 1.0:
+            print(f"⏳ Menunggu kuota {endpoint} '{model}' selama {waited:.1f} detik ({PRIORITY_NAMES[priority]}).")
+        return waited
+
+    def stats(self) -> dict:
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {f"{endpoint}:{model}": bucket.stats() for (endpoint, model), bucket in buckets.items()}
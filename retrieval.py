@@ -0,0 +1,98 @@
+import numpy as np
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60, with_scores: bool = False) -> list:
+    """
+    Menggabungkan beberapa daftar peringkat id (mis. hasil dense & BM25) dengan
+    Reciprocal Rank Fusion: skor = sum(1 / (k + peringkat)). Tidak butuh skor
+    mentah yang sebanding antar retriever, cukup urutannya.
+    Dengan with_scores=True hasilnya berupa [(id, skor)].
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [(chunk_id, scores[chunk_id]) for chunk_id in ordered] if with_scores else ordered
+
+
+def normalize_vectors(vectors) -> np.ndarray:
+    """Vektor (1-D) atau setiap baris matriks (2-D) sebagai float32 dengan panjang 1; vektor nol dibiarkan."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def merge_adjacent(candidates: list, max_chunks: int = 3, separator: str = "\n") -> list:
+    """
+    Gabungkan kandidat yang bertetangga di file yang sama (lewat metadata prev_id/next_id)
+    menjadi satu span, supaya potongan yang bersambung tidak dikirim sebagai chunk
+    terpisah yang isinya mirip. Setiap kandidat: {id, document, metadata, embedding, score}.
+    Span: {id, ids, document, metadata, embedding, score, members} dengan skor = skor anggota tertinggi.
+    """
+    by_id = {c["id"]: c for c in candidates}
+    heads = [c for c in candidates if (c["metadata"] or {}).get("prev_id") not in by_id]
+    spans, used = [], set()
+    for head in heads:
+        chain, current = [], head
+        while current is not None and current["id"] not in used:
+            chain.append(current)
+            used.add(current["id"])
+            current = by_id.get((current["metadata"] or {}).get("next_id"))
+        for start in range(0, len(chain), max_chunks):
+            spans.append(_make_span(chain[start:start + max_chunks], separator))
+    # Sisa (mis. rantai melingkar karena metadata rusak) tetap dipakai apa adanya
+    spans.extend(_make_span([c], separator) for c in candidates if c["id"] not in used)
+    return spans
+
+
+def _make_span(members: list, separator: str) -> dict:
+    return {
+        "id": members[0]["id"],
+        "ids": [m["id"] for m in members],
+        "document": separator.join(m["document"] for m in members),
+        "metadata": members[0]["metadata"],
+        "embedding": normalize_vectors(normalize_vectors([m["embedding"] for m in members]).mean(axis=0)),
+        "score": max(m["score"] for m in members),
+        "members": members,
+    }
+
+
+def _trim_span(span: dict, size: int, separator: str) -> dict:
+    """Potong span menjadi `size` chunk bersambung dengan total skor tertinggi."""
+    members = span["members"]
+    best = max(range(len(members) - size + 1), key=lambda i: sum(m["score"] for m in members[i:i + size]))
+    return _make_span(members[best:best + size], separator)
+
+
+def mmr_select(spans: list, k: int, lambda_: float = 0.7, separator: str = "\n") -> list:
+    """
+    Maximal Marginal Relevance: pilih span dengan relevansi tinggi (skor fusion, dinormalkan
+    ke 0..1) yang sekaligus paling tidak mirip (cosine embedding) dengan span yang sudah dipilih.
+    `k` dihitung dalam chunk, bukan span: span gabungan memakai satu jatah per anggotanya,
+    dan span yang melebihi sisa jatah dipotong, jadi konteks tidak lebih besar dari top-k biasa.
+    """
+    if not spans:
+        return []
+    top_score = max(s["score"] for s in spans) or 1.0
+    relevance = np.array([s["score"] / top_score for s in spans])
+    vectors = np.stack([s["embedding"] for s in spans])
+    similarity = vectors @ vectors.T
+    selected, remaining, slots = [], list(range(len(spans))), k
+    while remaining and slots > 0:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining))
+        scores = lambda_ * relevance[remaining] - (1 - lambda_) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+        slots -= min(len(spans[best]["ids"]), slots)
+    result, slots = [], k
+    for i in selected:
+        span = spans[i] if len(spans[i]["ids"]) <= slots else _trim_span(spans[i], slots, separator)
+        result.append(span)
+        slots -= len(span["ids"])
+    return result
@@ -0,0 +1,200 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from bm25_index import tokenize
+from retrieval import normalize_vectors
+
+
+def identifier_terms(question: str) -> frozenset:
+    """Token yang memuat angka ("5", "2025", "no3"): nomor pasal, tahun, nomor peraturan."""
+    return frozenset(token for token in tokenize(question) if any(ch.isdigit() for ch in token))
+
+
+class SemanticCache:
+    """
+    Cache jawaban berbasis kemiripan makna pertanyaan. Selain cocok persis
+    (pertanyaan yang dinormalisasi), jawaban juga diambil jika embedding
+    pertanyaan baru cukup mirip (cosine >= threshold) dengan pertanyaan yang
+    sudah pernah dijawab, mis. "apa itu dtsen" vs "dtsen itu apa ya?".
+
+    Entri dibuang dengan LRU (max_entries) dan TTL; penghitung hit/miss dipakai
+    untuk menyetel threshold terhadap latensi yang dihemat.
+
+    Kemiripan embedding saja tidak membedakan "permensos no 3 tahun 2025 pasal 5" dari
+    "... pasal 6", jadi hit semantik hanya diterima jika token identifier (angka)
+    kedua pertanyaan sama persis.
+
+    Setiap jawaban dicatat bersama id chunk sumbernya (id chunk memuat hash isi,
+    jadi sekaligus menjadi sidik jari korpus). Saat chunk itu berubah/dihapus,
+    hanya jawaban yang bergantung padanya yang dibuang.
+
+    Semua entri ada di memori untuk lookup; setiap perubahan diteruskan ke
+    `store` (ChatStore) per entri, bukan menulis ulang seluruh cache.
+    """
+
+    def __init__(self, store, threshold: float = 0.92, max_entries: int = 1000, ttl_seconds: float = 30 * 24 * 3600):
+        self.store = store
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # pertanyaan_normal -> {"answer", "embedding", "created_at", "sources"}
+        self._lock = threading.RLock()
+        self._matrix = None            # cache matriks embedding untuk nearest-neighbour
+        self._matrix_keys = []
+        self.stats_counters = {
+            "exact_hits": 0, "semantic_hits": 0, "misses": 0, "near_misses": 0, "identifier_mismatches": 0,
+            "evictions": 0, "invalidations": 0
+        }
+        self._miss_latency_total = 0.0
+        self._load()
+
+    # --- Persistensi ---
+    def _load(self):
+        for question, answer, embedding, created_at, sources in self.store.cache_entries():
+            self._entries[question] = {
+                "answer": answer,
+                "embedding": normalize_vectors(embedding) if embedding is not None else None,
+                "created_at": created_at,
+                "sources": sources,  # None = sumber tidak diketahui (entri lama)
+            }
+
+    def _persist(self, question: str):
+        entry = self._entries[question]
+        self.store.cache_put(question, entry["answer"], entry["embedding"], entry["created_at"], entry["sources"])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, question: str) -> bool:
+        return question in self._entries
+
+    # --- Operasi cache ---
+    def _is_expired(self, entry: dict) -> bool:
+        return self.ttl_seconds is not None and time.time() - entry["created_at"] > self.ttl_seconds
+
+    def _drop(self, question: str):
+        if self._entries.pop(question, None) is not None:
+            self.store.cache_delete(question)
+        self._matrix = None
+
+    def get_exact(self, question: str):
+        """Cek cocok persis (tanpa butuh embedding). Tidak menghitung miss."""
+        with self._lock:
+            entry = self._entries.get(question)
+            if entry is None:
+                return None
+            if self._is_expired(entry):
+                self._drop(question)
+                return None
+            self._entries.move_to_end(question)
+            self.stats_counters["exact_hits"] += 1
+            return entry["answer"]
+
+    def lookup(self, embedding, question: str = ""):
+        """
+        Nearest-neighbour di antara pertanyaan yang sudah di-cache.
+        Mengembalikan (jawaban, pertanyaan_cache, skor) atau None jika di bawah threshold
+        atau identifier di `question` tidak sama dengan pertanyaan yang di-cache.
+        """
+        query = normalize_vectors(embedding)
+        identifiers = identifier_terms(question)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix_keys = [q for q, e in self._entries.items() if e["embedding"] is not None]
+                self._matrix = (np.stack([self._entries[q]["embedding"] for q in self._matrix_keys])
+                                if self._matrix_keys else np.zeros((0, len(query)), dtype=np.float32))
+            if not self._matrix_keys:
+                self.stats_counters["misses"] += 1
+                return None
+
+            scores = self._matrix @ query
+            for row in np.argsort(-scores):
+                score = float(scores[row])
+                if score < self.threshold:
+                    break
+                cached_question = self._matrix_keys[row]
+                entry = self._entries.get(cached_question)
+                if entry is None:
+                    continue
+                if self._is_expired(entry):
+                    self._drop(cached_question)
+                    continue
+                if identifier_terms(cached_question) != identifiers:
+                    self.stats_counters["identifier_mismatches"] += 1
+                    continue
+                self._entries.move_to_end(cached_question)
+                self.stats_counters["semantic_hits"] += 1
+                return entry["answer"], cached_question, score
+
+            self.stats_counters["misses"] += 1
+            if len(scores) and scores.max() >= self.threshold - 0.05:
+                self.stats_counters["near_misses"] += 1
+            return None
+
+    def put(self, question: str, answer: str, embedding=None, sources=None):
+        with self._lock:
+            self._entries[question] = {
+                "answer": answer,
+                "embedding": normalize_vectors(embedding) if embedding is not None else None,
+                "created_at": time.time(),
+                "sources": sorted(sources) if sources is not None else None,
+            }
+            self._entries.move_to_end(question)
+            self._persist(question)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.store.cache_delete(evicted)
+                self.stats_counters["evictions"] += 1
+            self._matrix = None
+
+    def invalidate_chunks(self, chunk_ids) -> int:
+        """
+        Buang jawaban yang dibangun dari chunk yang berubah/dihapus. Entri lama tanpa
+        catatan sumber ikut dibuang, karena tidak bisa dipastikan masih valid.
+        """
+        changed = set(chunk_ids)
+        if not changed:
+            return 0
+        with self._lock:
+            stale = [
+                q for q, e in self._entries.items()
+                if e["sources"] is None or not changed.isdisjoint(e["sources"])
+            ]
+            for question in stale:
+                self._drop(question)
+            self.stats_counters["invalidations"] += len(stale)
+        return len(stale)
+
+    def missing_embeddings(self) -> list:
+        with self._lock:
+            return [q for q, e in self._entries.items() if e["embedding"] is None]
+
+    def set_embeddings(self, questions: list, embeddings: list):
+        with self._lock:
+            for question, embedding in zip(questions, embeddings):
+                if question in self._entries:
+                    self._entries[question]["embedding"] = normalize_vectors(embedding)
+                    self._persist(question)
+            self._matrix = None
+
+    def record_miss_latency(self, seconds: float):
+        with self._lock:
+            self._miss_latency_total += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+            hits = counters["exact_hits"] + counters["semantic_hits"]
+            lookups = hits + counters["misses"]
+            avg_miss_ms = (self._miss_latency_total / counters["misses"] * 1000) if counters["misses"] else 0.0
+            return {
+                **counters,
+                "size": len(self._entries),
+                "threshold": self.threshold,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "avg_miss_latency_ms": avg_miss_ms,
+                "estimated_saved_ms": hits * avg_miss_ms,
+            }
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class Session:
+    def __init__(self, session_id: str, max_turns: int, turns=()):
+        self.id = session_id
+        self.turns = deque(turns, maxlen=max_turns)
+        self.summary = ""          # ringkasan bergulir untuk giliran yang sudah keluar dari `turns`
+        self.summarizing = False   # ringkasan baru sedang dibuat di background
+        self.last_access = time.time()
+
+    @property
+    def size(self) -> int:
+        """Perkiraan memori sesi dalam karakter."""
+        return sum(len(q) + len(a) for q, a in self.turns) + len(self.summary)
+
+
+class SessionStore:
+    """
+    Riwayat percakapan per sesi dengan memori terbatas:
+    - tiap sesi hanya menyimpan `max_turns` giliran terakhir,
+    - sesi yang menganggur lebih dari `idle_ttl` detik dibuang,
+    - total isi semua sesi dibatasi `max_total_chars` (sesi paling lama tidak
+      aktif dibuang lebih dulu).
+    Riwayat tetap di-append ke ChatStore, jadi sesi yang dibuang dari memori
+    dimuat ulang dari disk saat dipakai lagi.
+
+    Giliran lama dapat dilipat ke ringkasan bergulir per sesi: `take_for_summary`
+    mengambil giliran yang perlu diringkas, `apply_summary` memasang hasilnya.
+    """
+
+    def __init__(self, chat_store, max_turns: int = 10, idle_ttl: float = 30 * 60,
+                 max_sessions: int = 1000, max_total_chars: int = 5_000_000):
+        self.chat_store = chat_store
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_total_chars = max_total_chars
+        self._sessions = OrderedDict()  # session_id -> Session, urut dari yang paling lama tidak aktif
+        self._total_chars = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _get(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            turns = self.chat_store.recent_history(self.max_turns, session_id=session_id)
+            session = Session(session_id, self.max_turns, turns)
+            self._sessions[session_id] = session
+            self._total_chars += session.size
+        session.last_access = time.time()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def context(self, session_id: str) -> tuple:
+        """(giliran terbaru, ringkasan giliran lama) milik sesi."""
+        with self._lock:
+            session = self._get(session_id)
+            turns, summary = list(session.turns), session.summary
+            self._evict()
+            return turns, summary
+
+    def take_for_summary(self, session_id: str, keep: int):
+        """
+        Tandai sesi sedang diringkas dan kembalikan (ringkasan lama, giliran terlama)
+        di luar `keep` giliran terbaru, atau None jika tidak ada yang perlu diringkas
+        atau ringkasan lain masih berjalan.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.summarizing or len(session.turns) <= keep:
+                return None
+            session.summarizing = True
+            return session.summary, list(session.turns)[:len(session.turns) - keep]
+
+    def apply_summary(self, session_id: str, summary, folded: list):
+        """
+        Pasang ringkasan baru dan buang giliran yang sudah terlipat ke dalamnya.
+        summary=None berarti peringkasan gagal; giliran dibiarkan apa adanya.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session.summarizing = False
+            if summary is None:
+                return
+            before = session.size
+            # Giliran bisa sudah tergeser keluar dari deque selama peringkasan berjalan
+            for turn in folded:
+                if session.turns and session.turns[0] == turn:
+                    session.turns.popleft()
+            session.summary = summary
+            self._total_chars += session.size - before
+
+    def append(self, session_id: str, question: str, answer: str):
+        with self._lock:
+            session = self._get(session_id)
+            before = session.size
+            session.turns.append((question, answer))
+            self._total_chars += session.size - before
+            self._evict(keep=session_id)
+        self.chat_store.append_history(question, answer, session_id=session_id)
+
+    def _evict(self, keep: str = None):
+        now = time.time()
+        for session_id in list(self._sessions):
+            session = self._sessions[session_id]
+            over_budget = self._total_chars > self.max_total_chars or len(self._sessions) > self.max_sessions
+            expired = now - session.last_access > self.idle_ttl
+            if not (expired or over_budget):
+                break  # urut LRU: sesi berikutnya lebih baru
+            if session_id == keep:
+                continue
+            self._total_chars -= session.size
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "total_chars": self._total_chars,
+                "max_total_chars": self.max_total_chars,
+                "evictions": self.evictions,
+            }
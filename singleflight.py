@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Menggabungkan pekerjaan identik yang sedang berjalan bersamaan: request pertama
+    untuk sebuah key (leader) mengerjakannya, request lain dengan key yang sama
+    selama leader masih berjalan cukup menunggu Future yang sama.
+    """
+
+    def __init__(self):
+        self._flights = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.stats_counters = {"leaders": 0, "coalesced": 0, "leader_errors": 0}
+
+    def begin(self, key) -> tuple:
+        """(future, is_leader). Leader wajib memanggil finish() untuk key tersebut."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.stats_counters["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            self.stats_counters["leaders"] += 1
+            return future, True
+
+    def join(self, key):
+        """Future leader yang sedang berjalan untuk `key`, atau None (tanpa menjadi leader)."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.stats_counters["coalesced"] += 1
+            return future
+
+    def finish(self, key, future: Future, result=None, error: BaseException = None):
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+            if error is not None:
+                self.stats_counters["leader_errors"] += 1
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.stats_counters, "in_flight": len(self._flights)}
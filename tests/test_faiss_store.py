@@ -0,0 +1,51 @@
+"""
+Regresi FaissStore: vektor yang dihapus dari index HNSW tetap ada di graf sebagai
+tombstone, tetapi query tetap harus mengembalikan n_results chunk yang masih hidup.
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from vector_store import FaissStore
+
+DIM = 32
+
+
+def build_store(path, count: int, index_type: str) -> tuple:
+    """Vektor acak, dengan 30 vektor pertama bergerombol di sekitar vektor query."""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((count, DIM)).astype(np.float32)
+    vectors[:30] = vectors[0] + 0.05 * rng.standard_normal((30, DIM)).astype(np.float32)
+    ids = [f"dokumen.txt:{i}:0" for i in range(count)]
+    store = FaissStore(path=str(path), index_type=index_type)
+    store.upsert(ids, vectors.tolist(), [f"isi {i}" for i in range(count)],
+                 [{"source_file": "dokumen.txt", "chunk_id": chunk_id} for chunk_id in ids])
+    store.persist()
+    return store, ids, vectors
+
+
+@pytest.mark.parametrize("persist_delete", [True, False])
+def test_hnsw_query_returns_n_results_after_deletes(tmp_path, persist_delete):
+    store, ids, vectors = build_store(tmp_path, 200, "hnsw")
+    # Hapus 30 tetangga terdekat query (di bawah ambang rebuild 20%)
+    deleted = set(ids[:30])
+    store.delete(sorted(deleted))
+    if persist_delete:
+        store.persist()
+        assert store._state[1]["tombstones"] == 30  # graf tidak dibangun ulang
+
+    hits = store.query(vectors[0].tolist(), n_results=10)
+    assert len(hits) == 10
+    assert not deleted & {hit["id"] for hit in hits}
+
+
+def test_hnsw_tombstones_survive_reopen(tmp_path):
+    store, ids, vectors = build_store(tmp_path, 200, "hnsw")
+    store.delete(ids[:30])
+    store.persist()
+
+    reopened = FaissStore(path=str(tmp_path), index_type="hnsw")
+    hits = reopened.query(vectors[0].tolist(), n_results=10)
+    assert len(hits) == 10
+    assert not set(ids[:30]) & {hit["id"] for hit in hits}
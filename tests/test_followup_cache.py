@@ -0,0 +1,86 @@
+"""
+Regresi cache jawaban bersama: pertanyaan lanjutan pendek ("lalu?") tidak boleh
+disimpan atau dicocokkan di cache dengan teks mentahnya, karena artinya bergantung
+pada riwayat sesi masing-masing.
+"""
+import hashlib
+
+import numpy as np
+import pytest
+
+main = pytest.importorskip("main")
+
+from chat_store import ChatStore
+from semantic_cache import SemanticCache
+from sessions import SessionStore
+from singleflight import SingleFlight
+
+
+class FakeQueryEmbeddings:
+    """Embedding deterministik per teks; teks berbeda praktis tidak pernah mirip."""
+
+    def get_or_compute(self, text, compute):
+        seed = int(hashlib.sha1(text.lower().encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).standard_normal(16).tolist()
+
+
+class FakeRewriter:
+    """Menulis ulang pertanyaan lanjutan dengan menyebut topik giliran terakhir sesi."""
+
+    def rewrite(self, question, turns, summary, generate):
+        return f"{question.strip('?')} setelah {turns[-1][0]}"
+
+
+class FakePromptBuilder:
+    def build(self, query, chunks, turns, summary):
+        info = dict.fromkeys(
+            ["total_tokens", "budget", "context_tokens", "chunks_used", "chunks_total",
+             "history_tokens", "turns_used", "turns_total", "summary_tokens"], 0
+        )
+        return query, info
+
+
+class FakeStore:
+    name = "fake"
+
+    def count(self):
+        return 1
+
+
+def make_bot(tmp_path):
+    bot = main.VectorRAGChatbot.__new__(main.VectorRAGChatbot)
+    chat_store = ChatStore(str(tmp_path / "chatbot_store.sqlite3"))
+    bot.sessions = SessionStore(chat_store)
+    bot.qa_cache = SemanticCache(chat_store)
+    bot.singleflight = SingleFlight()
+    bot.query_rewriter = FakeRewriter()
+    bot.query_embeddings = FakeQueryEmbeddings()
+    bot.prompt_builder = FakePromptBuilder()
+    bot.store = FakeStore()
+    bot._schedule_summary = lambda session_id, keep: None
+    bot._retrieve = lambda query, embedding: [{"document": f"dokumen {query}", "ids": [f"chunk:{query}"]}]
+    # Jawaban memuat pertanyaan (hasil tulis ulang) yang benar-benar dijawab model
+    bot._call_model_with_fallback = lambda prompt: f"jawaban untuk: {prompt}"
+    return bot
+
+
+def test_short_followup_does_not_leak_between_sessions(tmp_path):
+    bot = make_bot(tmp_path)
+
+    bot.get_response("apa syarat pemutakhiran data DTSEN", "u1")
+    first = bot.get_response("lalu?", "u1")
+    bot.get_response("apa syarat penerima bantuan PBI JK", "u2")
+    second = bot.get_response("lalu?", "u2")
+
+    assert "DTSEN" in first
+    assert "PBI" in second and "DTSEN" not in second
+    assert bot.qa_cache.get_exact("lalu?") is None
+
+
+def test_short_question_without_history_is_not_cached(tmp_path):
+    bot = make_bot(tmp_path)
+
+    bot.get_response("lalu?", "u1")
+
+    assert bot.qa_cache.get_exact("lalu?") is None
+    assert bot.qa_cache.stats()["size"] == 0
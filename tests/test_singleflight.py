@@ -0,0 +1,78 @@
+"""
+Regresi single-flight + executor chat: leader stream yang potongannya diambil di
+executor tidak boleh terkunci oleh duplikat yang menunggu di thread executor yang sama.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+main = pytest.importorskip("main")
+
+from latency import LatencyWindow
+from singleflight import SingleFlight
+
+QUESTION = "apa syarat penerima pbi jk?"
+TIMEOUT = 5
+
+
+def make_bot():
+    bot = main.VectorRAGChatbot.__new__(main.VectorRAGChatbot)
+    bot.singleflight = SingleFlight()
+    bot.ttft = LatencyWindow()
+    bot._resolve_question = lambda question, session_id: (question, False)
+    bot._remember = lambda *args, **kwargs: None
+    bot._generate_response = lambda question, session_id, is_dependent, query: "jawaban utuh"
+
+    def stream_answer(question, session_id, is_dependent, query, start_time):
+        yield "potongan-1 "
+        yield "potongan-2 "
+        yield "potongan-3"
+
+    bot._stream_answer = stream_answer
+    return bot
+
+
+def test_stream_does_not_deadlock_with_duplicate_chats():
+    bot = make_bot()
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        pieces = bot.stream_response(QUESTION, session_id="stream")
+        received = [executor.submit(next, pieces, None).result(timeout=TIMEOUT)]
+
+        # Duplikat /chat sebanyak jumlah worker datang setelah potongan pertama
+        chats = [executor.submit(bot.get_response, QUESTION, f"chat-{i}") for i in range(2)]
+
+        while True:
+            piece = executor.submit(next, pieces, None).result(timeout=TIMEOUT)
+            if piece is None:
+                break
+            received.append(piece)
+        assert "".join(received) == "potongan-1 potongan-2 potongan-3"
+        assert [chat.result(timeout=TIMEOUT) for chat in chats] == ["jawaban utuh", "jawaban utuh"]
+        assert bot.singleflight.stats()["in_flight"] == 0
+    finally:
+        # Melepas duplikat yang masih menunggu (jika terkunci) supaya thread executor bisa selesai
+        pieces.close()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_stream_joins_running_chat_flight():
+    bot = make_bot()
+    release = threading.Event()
+
+    def slow_generate(question, session_id, is_dependent, query):
+        release.wait(TIMEOUT)
+        return "jawaban leader"
+
+    bot._generate_response = slow_generate
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(bot.get_response, QUESTION, "chat")
+        while bot.singleflight.stats()["in_flight"] == 0:
+            pass
+        follower = executor.submit(lambda: list(bot.stream_response(QUESTION, session_id="stream")))
+        while bot.singleflight.stats()["coalesced"] == 0:
+            pass
+        release.set()
+        assert leader.result(timeout=TIMEOUT) == "jawaban leader"
+        assert follower.result(timeout=TIMEOUT) == ["jawaban leader"]
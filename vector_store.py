@@ -0,0 +1,668 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from retrieval import normalize_vectors
+
+
+class ChromaStore:
+    """Backend vector store berbasis ChromaDB (PersistentClient, SQLite + HNSW)."""
+
+    name = "chroma"
+
+    def __init__(self, path: str = "./chroma_db", collection_name: str = "dokumen_utama"):
+        import chromadb  # import berat, hanya dimuat jika backend ini dipakai
+
+        self.path = path
+        self.manifest_path = os.path.join(path, "index_manifest.json")
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def get_ids(self) -> list:
+        return self.collection.get(include=[])['ids']
+
+    def get(self, ids: list, include_embeddings: bool = False) -> list:
+        if not ids:
+            return []  # Chroma menolak daftar id kosong
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        results = self.collection.get(ids=list(ids), include=include)
+        found = {
+            chunk_id: {"id": chunk_id, "document": doc, "metadata": meta}
+            for chunk_id, doc, meta in zip(results['ids'], results['documents'], results['metadatas'])
+        }
+        if include_embeddings:
+            for chunk_id, embedding in zip(results['ids'], results['embeddings']):
+                found[chunk_id]["embedding"] = list(embedding)
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+
+    def upsert(self, ids: list, embeddings: list, documents: list, metadatas: list):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update_metadata(self, ids: list, metadatas: list):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids: list):
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def persist(self):
+        pass  # Chroma menulis langsung ke disk
+
+    def query(self, embedding: list, n_results: int = 3, exclude_ids=frozenset(), source_files=None) -> list:
+        return self.query_batch([embedding], n_results, [(exclude_ids, source_files)])[0]
+
+    @staticmethod
+    def _where(exclude_ids, source_files):
+        conditions = []
+        if exclude_ids:
+            conditions.append({"chunk_id": {"$nin": list(exclude_ids)}})
+        if source_files is not None:
+            conditions.append({"source_file": {"$in": list(source_files)}})
+        return {"$and": conditions} if len(conditions) > 1 else (conditions[0] if conditions else None)
+
+    def _query(self, embeddings: list, n_results: int, where) -> list:
+        results = self.collection.query(query_embeddings=list(embeddings), n_results=n_results, where=where)
+        return [
+            [
+                # Embedding Gemini sudah ternormalisasi, jadi L2^2 = 2 - 2*cos
+                {"id": chunk_id, "document": doc, "metadata": meta, "score": 1.0 - dist / 2.0}
+                for chunk_id, doc, meta, dist in zip(ids, documents, metadatas, distances)
+            ]
+            for ids, documents, metadatas, distances in zip(
+                results['ids'], results['documents'], results['metadatas'], results['distances']
+            )
+        ]
+
+    def query_batch(self, embeddings: list, n_results: int = 3, filters=None) -> list:
+        """
+        Satu panggilan query Chroma untuk banyak embedding. `filters` berisi satu
+        (exclude_ids, source_files) per embedding: Chroma dicari di gabungan file semua
+        permintaan (hanya chunk tersembunyi milik semua permintaan yang disaring di Chroma)
+        dengan n_results dilebihkan, lalu hasil disaring per permintaan. Permintaan yang
+        hasilnya kurang setelah disaring dicari ulang sendiri dengan filternya.
+        """
+        filters = list(filters) if filters is not None else [(frozenset(), None)] * len(embeddings)
+        if not embeddings:
+            return []
+        excludes = [frozenset(exclude_ids or ()) for exclude_ids, _ in filters]
+        files = [frozenset(source_files) if source_files is not None else None for _, source_files in filters]
+        shared_exclude = frozenset.intersection(*excludes)
+        union_files = None if any(f is None for f in files) else frozenset().union(*files)
+        distinct = len(set(zip(excludes, files)))
+        if distinct == 1:
+            return self._query(embeddings, n_results, self._where(shared_exclude, union_files))
+
+        extra = max(len(exclude - shared_exclude) for exclude in excludes)
+        fetch = max(n_results, min(n_results * distinct + extra, self.count()))
+        batch = self._query(embeddings, fetch, self._where(shared_exclude, union_files))
+        results = []
+        for embedding, hits, exclude, allowed in zip(embeddings, batch, excludes, files):
+            kept = [
+                hit for hit in hits
+                if hit["id"] not in exclude and (allowed is None or hit["metadata"].get("source_file") in allowed)
+            ]
+            if len(kept) < n_results and len(hits) == fetch:
+                kept = self._query([embedding], n_results, self._where(exclude, allowed))[0]
+            results.append(kept[:n_results])
+        return results
+
+
+class NumpyStore:
+    """
+    Backend pencarian exact di dalam proses: semua vektor chunk disimpan dalam satu
+    matriks float32 kontigu yang sudah dinormalisasi, sehingga top-k cukup satu
+    perkalian matriks-vektor + argpartition. Cocok untuk korpus kecil (ratusan
+    sampai puluhan ribu chunk) dan jauh lebih ringan dari Chroma saat startup.
+
+    Setiap penulisan membangun state baru lalu menukarnya sekaligus, jadi query
+    dari thread lain selalu melihat versi index yang konsisten.
+    """
+
+    name = "numpy"
+
+    def __init__(self, path: str = "./numpy_index"):
+        self.path = path
+        self.manifest_path = os.path.join(path, "index_manifest.json")
+        self._vectors_path = os.path.join(path, "vectors.npy")
+        self._records_path = os.path.join(path, "records.json")
+        self._write_lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._state = self._load()
+
+    # --- State & persistensi ---
+    @staticmethod
+    def _make_state(ids: list, matrix: np.ndarray, documents: list, metadatas: list) -> tuple:
+        file_rows = {}
+        for row, meta in enumerate(metadatas):
+            file_rows.setdefault(meta.get("source_file", ""), []).append(row)
+        return ids, np.ascontiguousarray(matrix, dtype=np.float32), documents, metadatas, {
+            chunk_id: row for row, chunk_id in enumerate(ids)
+        }, {name: np.array(rows, dtype=np.int64) for name, rows in file_rows.items()}
+
+    def _load(self) -> tuple:
+        try:
+            with open(self._records_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            matrix = np.load(self._vectors_path)
+            if len(records["ids"]) == matrix.shape[0]:
+                return self._make_state(records["ids"], matrix, records["documents"], records["metadatas"])
+            print("⚠️ Index NumPy tidak konsisten (jumlah vektor != jumlah record), mulai dari kosong.")
+        except (FileNotFoundError, json.JSONDecodeError, ValueError):
+            pass
+        return self._make_state([], np.zeros((0, 0), dtype=np.float32), [], [])
+
+    def persist(self):
+        ids, matrix, documents, metadatas, _, _ = self._state
+        tmp_vectors = self._vectors_path + ".tmp.npy"
+        tmp_records = self._records_path + ".tmp"
+        np.save(tmp_vectors, matrix)
+        with open(tmp_records, 'w', encoding='utf-8') as f:
+            json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f, ensure_ascii=False)
+        os.replace(tmp_vectors, self._vectors_path)
+        os.replace(tmp_records, self._records_path)
+
+    # --- Operasi index ---
+    def count(self) -> int:
+        return len(self._state[0])
+
+    def get_ids(self) -> list:
+        return list(self._state[0])
+
+    def get(self, ids: list, include_embeddings: bool = False) -> list:
+        _, matrix, documents, metadatas, index, _ = self._state
+        results = []
+        for chunk_id in ids:
+            if chunk_id not in index:
+                continue
+            row = index[chunk_id]
+            result = {"id": chunk_id, "document": documents[row], "metadata": metadatas[row]}
+            if include_embeddings:
+                result["embedding"] = matrix[row]
+            results.append(result)
+        return results
+
+    def upsert(self, ids: list, embeddings: list, documents: list, metadatas: list):
+        if not ids:
+            return
+        new_vectors = normalize_vectors(embeddings)
+        with self._write_lock:
+            old_ids, matrix, old_docs, old_metas, index, _ = self._state
+            ids_out, docs_out, metas_out = list(old_ids), list(old_docs), list(old_metas)
+            matrix_out = matrix.copy() if matrix.size else np.zeros((0, new_vectors.shape[1]), dtype=np.float32)
+            appended = []
+            for i, chunk_id in enumerate(ids):
+                row = index.get(chunk_id)
+                if row is None:
+                    appended.append(i)
+                    ids_out.append(chunk_id)
+                    docs_out.append(documents[i])
+                    metas_out.append(metadatas[i])
+                else:
+                    matrix_out[row] = new_vectors[i]
+                    docs_out[row] = documents[i]
+                    metas_out[row] = metadatas[i]
+            if appended:
+                matrix_out = np.vstack([matrix_out, new_vectors[appended]])
+            self._state = self._make_state(ids_out, matrix_out, docs_out, metas_out)
+
+    def update_metadata(self, ids: list, metadatas: list):
+        with self._write_lock:
+            old_ids, matrix, documents, old_metas, index, file_rows = self._state
+            metas_out = list(old_metas)
+            for chunk_id, meta in zip(ids, metadatas):
+                if chunk_id in index:
+                    metas_out[index[chunk_id]] = meta
+            # Metadata yang diperbarui hanya tautan prev/next; file sumber chunk tidak berubah
+            self._state = (old_ids, matrix, documents, metas_out, index, file_rows)
+
+    def delete(self, ids: list):
+        drop = set(ids)
+        if not drop:
+            return
+        with self._write_lock:
+            old_ids, matrix, documents, metadatas, _, _ = self._state
+            keep = [row for row, chunk_id in enumerate(old_ids) if chunk_id not in drop]
+            self._state = self._make_state(
+                [old_ids[r] for r in keep], matrix[keep] if matrix.size else matrix,
+                [documents[r] for r in keep], [metadatas[r] for r in keep]
+            )
+
+    def query(self, embedding: list, n_results: int = 3, exclude_ids=frozenset(), source_files=None) -> list:
+        return self.query_batch([embedding], n_results, [(exclude_ids, source_files)])[0]
+
+    def query_batch(self, embeddings: list, n_results: int = 3, filters=None) -> list:
+        """
+        Banyak query sekaligus: satu perkalian matriks-matriks, lalu top-k per kolom.
+        `filters` berisi satu (exclude_ids, source_files) per embedding dan diterapkan
+        sebagai mask per kolom, jadi permintaan dengan filter berbeda tetap satu batch.
+        Jika semua permintaan dibatasi ke file tertentu, hanya baris gabungan file
+        tersebut yang dikalikan.
+        """
+        ids, matrix, documents, metadatas, index, file_rows = self._state
+        if not ids:
+            return [[] for _ in embeddings]
+        filters = list(filters) if filters is not None else [(frozenset(), None)] * len(embeddings)
+
+        item_rows = []
+        for _, source_files in filters:
+            if source_files is None:
+                item_rows.append(None)
+                continue
+            parts = [file_rows[name] for name in source_files if name in file_rows]
+            item_rows.append(np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64))
+        searched = None
+        if item_rows and all(rows is not None for rows in item_rows):
+            searched = np.unique(np.concatenate(item_rows))
+        scores = (matrix if searched is None else matrix[searched]) @ normalize_vectors(embeddings).T
+
+        hidden_rows = {}
+        results = []
+        for column, rows, (exclude_ids, _) in zip(scores.T, item_rows, filters):
+            if rows is None:
+                rows = np.arange(len(ids))
+            values = column[rows if searched is None else np.searchsorted(searched, rows)]
+            if exclude_ids:
+                key = frozenset(exclude_ids)
+                if key not in hidden_rows:
+                    hidden_rows[key] = np.array([index[c] for c in key if c in index], dtype=np.int64)
+                if hidden_rows[key].size:
+                    values[np.isin(rows, hidden_rows[key])] = -np.inf
+            k = min(n_results, int(np.count_nonzero(values > -np.inf)))
+            if k <= 0:
+                results.append([])
+                continue
+            top = np.argpartition(-values, k - 1)[:k]
+            top = top[np.argsort(-values[top])]
+            results.append([
+                {"id": ids[r], "document": documents[r], "metadata": metadatas[r], "score": float(score)}
+                for r, score in zip(rows[top], values[top])
+            ])
+        return results
+
+
+class FaissStore:
+    """
+    Backend FAISS untuk korpus besar (bertahun-tahun berita hasil scraping + regulasi).
+
+    - Jenis index: "flat" (exact) untuk korpus kecil, "ivf" atau "hnsw" (approximate)
+      untuk korpus besar; mode "auto" memakai flat lalu beralih ke IVF setelah
+      `ivf_min_vectors` vektor. IVF dilatih ulang setiap jumlah vektor berlipat dua.
+    - File index flat dan IVF dibuka dengan mmap (IO_FLAG_MMAP_IFC untuk kode flat,
+      IO_FLAG_MMAP untuk inverted list IVF), jadi startup tidak memuat semua vektor ke
+      RAM. Graf HNSW tidak bisa di-mmap dan selalu dimuat penuh ke memori.
+    - Dokumen, metadata, dan salinan vektor (untuk melatih ulang/membangun ulang index)
+      disimpan di sidecar SQLite, bukan pickle seperti index LangChain lama di
+      ./vectorstore_index (index lama itu memakai model embedding lain, jadi tidak dimuat).
+
+    Penulisan langsung masuk ke docstore, sedangkan index FAISS diperbarui saat persist()
+    lalu dibuka ulang dan ditukar sekaligus. Pemanggil sudah menyembunyikan chunk yang
+    sedang diindeks sampai commit (lihat _sync_vector_db), jadi urutan ini aman.
+    HNSW tidak mendukung penghapusan: id yang dihapus menjadi tombstone yang dikecualikan
+    di dalam pencarian, dan index dibangun ulang jika tombstone melebihi `max_tombstone_ratio`.
+    """
+
+    name = "faiss"
+    INDEX_TYPES = ("auto", "flat", "ivf", "hnsw")
+
+    def __init__(self, path: str = "./faiss_index", index_type: str = "auto", ivf_min_vectors: int = 20000,
+                 nprobe: int = 16, hnsw_m: int = 32, ef_search: int = 64, mmap: bool = True,
+                 max_tombstone_ratio: float = 0.2):
+        import faiss  # opsional (pip install faiss-cpu), hanya dimuat jika backend ini dipakai
+
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Jenis index FAISS tidak dikenal: '{index_type}'. Pilihan: {', '.join(self.INDEX_TYPES)}")
+        self._faiss = faiss
+        self.path = path
+        self.index_type = index_type
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.mmap = mmap
+        self.max_tombstone_ratio = max_tombstone_ratio
+        self.manifest_path = os.path.join(path, "index_manifest.json")
+        self._index_path = os.path.join(path, "index.faiss")
+        self._meta_path = os.path.join(path, "index_meta.json")
+        self._lock = threading.Lock()         # koneksi SQLite
+        self._write_lock = threading.Lock()   # membangun/menukar index
+        os.makedirs(path, exist_ok=True)
+
+        self._conn = sqlite3.connect(os.path.join(path, "docstore.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # faiss_id AUTOINCREMENT: id tidak pernah dipakai ulang, jadi tombstone HNSW tidak tertukar
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                   faiss_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   chunk_id TEXT NOT NULL UNIQUE,
+                   source_file TEXT NOT NULL,
+                   document TEXT NOT NULL,
+                   metadata TEXT NOT NULL,
+                   vector BLOB NOT NULL,
+                   indexed INTEGER NOT NULL DEFAULT 0
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source_file ON chunks(source_file)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_indexed ON chunks(indexed)")
+        # id yang sudah ada di file index tapi dihapus dari docstore, dibuang dari index saat persist
+        self._conn.execute("CREATE TABLE IF NOT EXISTS removed (faiss_id INTEGER PRIMARY KEY)")
+        # id yang dihapus tapi masih ada di graf HNSW, dikecualikan di dalam pencarian sampai dibangun ulang
+        self._conn.execute("CREATE TABLE IF NOT EXISTS tombstones (faiss_id INTEGER PRIMARY KEY)")
+        self._conn.commit()
+
+        # (index, meta, tombstone) selalu ditukar bersama supaya query tidak memakai parameter jenis index lain
+        meta = self._load_meta()
+        self._state = (self._open_index(meta.get("kind")), meta, self._load_ids("tombstones"))
+
+    # --- File index & metadata ---
+    def _load_meta(self) -> dict:
+        try:
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _open_index(self, kind: str):
+        if not os.path.exists(self._index_path):
+            return None
+        faiss = self._faiss
+        # IO_FLAG_MMAP hanya me-mmap inverted list IVF; kode IndexFlat butuh IO_FLAG_MMAP_IFC
+        flag = {"flat": getattr(faiss, "IO_FLAG_MMAP_IFC", None), "ivf": faiss.IO_FLAG_MMAP}.get(kind)
+        if self.mmap and flag is not None:
+            try:
+                return faiss.read_index(self._index_path, flag | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                print(f"⚠️ Index FAISS tidak bisa dibuka dengan mmap, dimuat ke memori: {e}")
+        return faiss.read_index(self._index_path)
+
+    def _load_ids(self, table: str) -> np.ndarray:
+        with self._lock:
+            return np.array([row[0] for row in self._conn.execute(f"SELECT faiss_id FROM {table}")], dtype=np.int64)
+
+    def _choose_kind(self, count: int) -> str:
+        if self.index_type != "auto":
+            return self.index_type
+        return "ivf" if count >= self.ivf_min_vectors else "flat"
+
+    def _new_index(self, kind: str, dim: int, count: int):
+        faiss = self._faiss
+        if kind == "flat":
+            return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        if kind == "hnsw":
+            return faiss.IndexIDMap2(faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT))
+        nlist = max(1, min(int(4 * math.sqrt(count)), count // 39))  # FAISS butuh ~39 vektor latih per list
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(self._sample_vectors(nlist * 64))
+        return index
+
+    # --- Docstore ---
+    @staticmethod
+    def _to_vector(blob) -> np.ndarray:
+        return np.frombuffer(blob, dtype=np.float32)
+
+    def _sample_vectors(self, limit: int) -> np.ndarray:
+        with self._lock:
+            rows = self._conn.execute("SELECT vector FROM chunks ORDER BY RANDOM() LIMIT ?", (limit,)).fetchall()
+        return np.vstack([self._to_vector(blob) for blob, in rows])
+
+    def _iter_vectors(self, where: str = "", batch_size: int = 10000):
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT faiss_id, vector FROM chunks WHERE faiss_id > ? {where} ORDER BY faiss_id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield (np.array([faiss_id for faiss_id, _ in rows], dtype=np.int64),
+                   np.vstack([self._to_vector(blob) for _, blob in rows]))
+
+    def _faiss_ids(self, column: str, values) -> np.ndarray:
+        values = list(values)
+        found = []
+        with self._lock:
+            for start in range(0, len(values), 500):
+                part = values[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                found.extend(row[0] for row in self._conn.execute(
+                    f"SELECT faiss_id FROM chunks WHERE indexed = 1 AND {column} IN ({placeholders})", part
+                ))
+        return np.array(sorted(found), dtype=np.int64)
+
+    def _retire(self, chunk_ids: list):
+        """Hapus chunk dari docstore; yang sudah ada di file index dicatat untuk dibuang saat persist."""
+        for start in range(0, len(chunk_ids), 500):
+            part = chunk_ids[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            self._conn.execute(
+                f"INSERT OR IGNORE INTO removed (faiss_id) "
+                f"SELECT faiss_id FROM chunks WHERE indexed = 1 AND chunk_id IN ({placeholders})", part
+            )
+            self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", part)
+
+    # --- Operasi index ---
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def get_ids(self) -> list:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT chunk_id FROM chunks")]
+
+    def get(self, ids: list, include_embeddings: bool = False) -> list:
+        ids = list(ids)
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                for chunk_id, doc, meta, blob in self._conn.execute(
+                    f"SELECT chunk_id, document, metadata, vector FROM chunks WHERE chunk_id IN ({placeholders})", part
+                ):
+                    found[chunk_id] = {"id": chunk_id, "document": doc, "metadata": json.loads(meta)}
+                    if include_embeddings:
+                        found[chunk_id]["embedding"] = self._to_vector(blob)
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+
+    def upsert(self, ids: list, embeddings: list, documents: list, metadatas: list):
+        if not ids:
+            return
+        vectors = normalize_vectors(embeddings)
+        with self._lock:
+            # Chunk yang sudah ada mendapat faiss_id baru; id lama dibuang dari index saat persist
+            self._retire(list(ids))
+            self._conn.executemany(
+                "INSERT INTO chunks (chunk_id, source_file, document, metadata, vector) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (chunk_id, meta.get("source_file", ""), doc, json.dumps(meta, ensure_ascii=False), vector.tobytes())
+                    for chunk_id, doc, meta, vector in zip(ids, documents, metadatas, vectors)
+                ]
+            )
+            self._conn.commit()
+
+    def update_metadata(self, ids: list, metadatas: list):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET metadata = ? WHERE chunk_id = ?",
+                [(json.dumps(meta, ensure_ascii=False), chunk_id) for chunk_id, meta in zip(ids, metadatas)]
+            )
+            self._conn.commit()
+
+    def delete(self, ids: list):
+        if not ids:
+            return
+        with self._lock:
+            self._retire(list(ids))
+            self._conn.commit()
+
+    def persist(self):
+        """Terapkan perubahan docstore ke file index FAISS, lalu buka ulang (mmap) dan tukar."""
+        faiss = self._faiss
+        with self._write_lock:
+            with self._lock:
+                count = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+                pending = self._conn.execute("SELECT COUNT(*) FROM chunks WHERE indexed = 0").fetchone()[0]
+                removed = np.array(
+                    [row[0] for row in self._conn.execute("SELECT faiss_id FROM removed")], dtype=np.int64
+                )
+            current, meta, _ = self._state
+            if not pending and not removed.size and current is not None:
+                return
+
+            kind = self._choose_kind(count)
+            tombstones = meta.get("tombstones", 0) + (removed.size if kind == "hnsw" else 0)
+            rebuild = (
+                current is None
+                or meta.get("kind") != kind
+                or (kind == "ivf" and count > 2 * meta.get("trained_on", 0))
+                or (kind == "hnsw" and tombstones > self.max_tombstone_ratio * max(count, 1))
+            )
+
+            if not count:
+                index, meta = None, {}
+            elif rebuild:
+                dim = len(self._sample_vectors(1)[0])
+                index = self._new_index(kind, dim, count)
+                for faiss_ids, vectors in self._iter_vectors():
+                    index.add_with_ids(vectors, faiss_ids)
+                meta = {"kind": kind, "dim": dim, "trained_on": count, "tombstones": 0}
+                print(f"🏗️ Index FAISS '{kind}' dibangun ulang dengan {count} vektor.")
+            else:
+                index = faiss.read_index(self._index_path)  # salinan yang bisa ditulis
+                if removed.size and kind != "hnsw":
+                    index.remove_ids(removed)
+                for faiss_ids, vectors in self._iter_vectors("AND indexed = 0"):
+                    index.add_with_ids(vectors, faiss_ids)
+                meta = {**meta, "tombstones": tombstones}
+
+            if index is None:
+                for stale_path in (self._index_path, self._meta_path):
+                    if os.path.exists(stale_path):
+                        os.remove(stale_path)
+            else:
+                tmp_index = self._index_path + ".tmp"
+                faiss.write_index(index, tmp_index)
+                tmp_meta = self._meta_path + ".tmp"
+                with open(tmp_meta, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f)
+                os.replace(tmp_index, self._index_path)
+                os.replace(tmp_meta, self._meta_path)
+
+            with self._lock:
+                if index is None or rebuild:
+                    self._conn.execute("DELETE FROM tombstones")
+                elif kind == "hnsw":
+                    self._conn.execute("INSERT OR IGNORE INTO tombstones (faiss_id) SELECT faiss_id FROM removed")
+                self._conn.execute("UPDATE chunks SET indexed = 1 WHERE indexed = 0")
+                self._conn.execute("DELETE FROM removed")
+                self._conn.commit()
+            self._state = (self._open_index(meta.get("kind")), meta, self._load_ids("tombstones"))
+
+    def _search_params(self, kind: str, selector):
+        faiss = self._faiss
+        if kind == "ivf":
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        if kind == "hnsw":
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        return faiss.SearchParameters(sel=selector) if selector is not None else None
+
+    def query(self, embedding: list, n_results: int = 3, exclude_ids=frozenset(), source_files=None) -> list:
+        return self.query_batch([embedding], n_results, [(exclude_ids, source_files)])[0]
+
+    def _selector(self, exclude_ids, source_files, dead: np.ndarray) -> tuple:
+        """
+        (selector, objek yang harus tetap hidup selama pencarian) untuk satu filter;
+        selector `False` berarti tidak ada id yang boleh dikembalikan. `dead` adalah id
+        yang masih ada di index tapi sudah dihapus dari docstore (tombstone HNSW dan
+        penghapusan yang belum di-persist); tanpa filter file, id ini dikecualikan di
+        dalam pencarian supaya top-k tidak berkurang setelah disaring lewat docstore.
+        """
+        faiss = self._faiss
+        excluded = self._faiss_ids("chunk_id", exclude_ids) if exclude_ids else np.zeros(0, dtype=np.int64)
+        if source_files is None:
+            excluded = np.union1d(excluded, dead)
+        if source_files is not None:
+            allowed = np.setdiff1d(self._faiss_ids("source_file", source_files), excluded)
+            if not allowed.size:
+                return False, ()
+            return faiss.IDSelectorBatch(allowed.size, faiss.swig_ptr(allowed)), (allowed,)
+        if excluded.size:
+            batch = faiss.IDSelectorBatch(excluded.size, faiss.swig_ptr(excluded))
+            return faiss.IDSelectorNot(batch), (excluded, batch)
+        return None, ()
+
+    def query_batch(self, embeddings: list, n_results: int = 3, filters=None) -> list:
+        """
+        Pencarian FAISS untuk banyak embedding. `filters` berisi satu (exclude_ids,
+        source_files) per embedding dan diterapkan di dalam FAISS lewat IDSelector, bukan
+        disaring setelah top-k; embedding dengan filter yang sama dicari dalam satu
+        panggilan search.
+        """
+        index, meta, tombstones = self._state
+        results = [[] for _ in embeddings]
+        if index is None or index.ntotal == 0:
+            return results
+        filters = list(filters) if filters is not None else [(frozenset(), None)] * len(embeddings)
+        vectors = normalize_vectors(embeddings)
+        dead = np.union1d(tombstones, self._load_ids("removed"))
+
+        groups = {}
+        for position, (exclude_ids, source_files) in enumerate(filters):
+            key = (frozenset(exclude_ids or ()), frozenset(source_files) if source_files is not None else None)
+            groups.setdefault(key, []).append(position)
+
+        # Ambil sedikit lebih banyak dari n_results: chunk yang terhapus selagi query berjalan disaring lewat docstore
+        k = min(index.ntotal, 2 * n_results)
+        searched = []
+        for (exclude_ids, source_files), positions in groups.items():
+            selector, keep_alive = self._selector(exclude_ids, source_files, dead)
+            if selector is False:
+                continue
+            scores, faiss_ids = index.search(
+                vectors[positions], k, params=self._search_params(meta.get("kind"), selector)
+            )
+            searched.append((positions, scores, faiss_ids))
+
+        wanted = sorted({int(i) for _, _, faiss_ids in searched for i in faiss_ids.ravel() if i >= 0})
+        records = {}
+        with self._lock:
+            for start in range(0, len(wanted), 500):
+                part = wanted[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                for faiss_id, chunk_id, doc, meta_json in self._conn.execute(
+                    f"SELECT faiss_id, chunk_id, document, metadata FROM chunks WHERE faiss_id IN ({placeholders})", part
+                ):
+                    records[faiss_id] = {"id": chunk_id, "document": doc, "metadata": json.loads(meta_json)}
+
+        for positions, scores, faiss_ids in searched:
+            for position, row_scores, row_ids in zip(positions, scores, faiss_ids):
+                hits = [
+                    {**records[int(faiss_id)], "score": float(score)}
+                    for score, faiss_id in zip(row_scores, row_ids)
+                    if faiss_id >= 0 and int(faiss_id) in records
+                ]
+                results[position] = hits[:n_results]
+        return results
+
+
+VECTOR_STORE_BACKENDS = {
+    "chroma": ChromaStore,
+    "numpy": NumpyStore,
+    "faiss": FaissStore,
+}
+
+
+def create_vector_store(backend: str, **kwargs):
+    try:
+        store_cls = VECTOR_STORE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend vector store tidak dikenal: '{backend}'. Pilihan: {', '.join(VECTOR_STORE_BACKENDS)}")
+    return store_cls(**kwargs)